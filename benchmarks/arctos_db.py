@@ -0,0 +1,202 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import random
+import sqlite3
+
+from benchmarks.pipeline import StageTimes
+from benchmarks.synthetic import ARCTOS_ATTRIBUTES, COLLECTORS
+from ranges.arctos import quote_identifier
+from ranges.query_builder import ARCTOS_FIELDS, GUID_BATCH_SIZE, batched_queries, in_condition, load_attributes
+from ranges.sheets import SheetParser
+from ranges.workbooks import read_sheet
+
+LEGACY_QUERY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "queries", "get_arctos_data.sql")
+
+# Columns of the Arctos flat table used by the queries in this repo
+FLAT_COLUMNS = ["collection_object_id", "guid", "guid_prefix", "cat_num", "genus", "species", "subspecies", "ended_date",
+                "collectors", "country", "state_prov", "county", "spec_locality", "collectornumber", "verbatim_date",
+                "parts", "sex"]
+
+# Attribute types present in Arctos which the pipeline never asks for
+OTHER_ATTRIBUTES = ["sex", "age class", "verbatim preservation date", "numeric age"]
+
+GENERA = ["Sorex", "Notiosorex", "Peromyscus", "Microtus", "Thomomys"]
+STATES = ["California", "Nevada", "Oregon", "Arizona", "Baja California"]
+
+
+def create_tables(connection: sqlite3.Connection, flat_columns: list[str] = FLAT_COLUMNS):
+    columns = [f"{quote_identifier(column)} " + ("INTEGER PRIMARY KEY" if column == "collection_object_id" else "TEXT")
+               for column in flat_columns]
+    connection.execute(f"CREATE TABLE flat ({', '.join(columns)})")
+    connection.execute("CREATE TABLE attributes (collection_object_id INTEGER, attribute_type TEXT, attribute_value TEXT)")
+
+
+def create_indexes(connection: sqlite3.Connection):
+    # Built after loading, which is much faster than maintaining them row by row
+    connection.execute("CREATE UNIQUE INDEX flat_guid ON flat (guid)")
+    connection.execute("CREATE INDEX attributes_object_type ON attributes (collection_object_id, attribute_type)")
+    connection.execute("ANALYZE")
+    connection.commit()
+
+
+def generate_tables(connection: sqlite3.Connection, specimens: int, fill_rate: float, generator: random.Random,
+                    first_catalog_number: int = 100000):
+    create_tables(connection)
+
+    for start in range(0, specimens, GUID_BATCH_SIZE):
+        flat_rows = []
+        attribute_rows = []
+
+        for collection_object_id in range(start, min(start + GUID_BATCH_SIZE, specimens)):
+            catalog_number = first_catalog_number + collection_object_id
+            collectors = generator.choice([collector for collector in COLLECTORS if collector is not None])
+
+            flat_rows.append((collection_object_id, f"MVZ:Mamm:{catalog_number}", "MVZ:Mamm", str(catalog_number),
+                              generator.choice(GENERA), "sp.", None, "2009-09-15", collectors, "United States",
+                              generator.choice(STATES), None, None, None, None, "skin, skull", None))
+
+            for attribute_type in ARCTOS_ATTRIBUTES + OTHER_ATTRIBUTES:
+                if generator.random() < fill_rate:
+                    attribute_rows.append((collection_object_id, attribute_type, str(generator.randint(1, 200))))
+
+        connection.executemany(f"INSERT INTO flat VALUES ({', '.join('?' * len(FLAT_COLUMNS))})", flat_rows)
+        connection.executemany("INSERT INTO attributes VALUES (?, ?, ?)", attribute_rows)
+
+    connection.commit()
+
+
+def load_table(connection: sqlite3.Connection, table: str, csv_path: str):
+    with open(csv_path, "r", encoding="utf8", newline="") as csv_file:
+        reader = csv.reader(csv_file)
+        columns = next(reader)
+
+        connection.execute(f"CREATE TABLE {table} ({', '.join(quote_identifier(column) for column in columns)})")
+        connection.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})",
+                               (row for row in reader if len(row) == len(columns)))
+
+    connection.commit()
+
+
+def self_join_query(attributes: list[str], fields: list[str], conditions: list[tuple[str, list]]) -> tuple[str, list]:
+    # The shape of queries/get_arctos_data.sql, one filtered self-join per attribute
+    select = list(fields)
+    tables = ["flat"]
+    params = []
+
+    for index, attribute in enumerate(attributes):
+        select.append(f"a{index}.attribute_value AS {quote_identifier(attribute)}")
+        tables.append(f"LEFT OUTER JOIN (SELECT * FROM attributes WHERE attribute_type = ?) AS a{index} "
+                      f"ON flat.collection_object_id = a{index}.collection_object_id")
+        params.append(attribute)
+
+    where = " AND ".join(condition for condition, _ in conditions)
+    for _, condition_params in conditions:
+        params.extend(condition_params)
+
+    return f"SELECT {', '.join(select)} FROM {' '.join(tables)} WHERE {where} ORDER BY flat.guid", params
+
+
+def workbook_guids(pattern: str) -> list[str]:
+    guids = set()
+    for accession_file in sorted(glob.glob(pattern)):
+        columns, rows = read_sheet(accession_file)
+        if len(columns) == 0:
+            continue
+
+        plan = SheetParser.compile_header(columns)
+        for row in rows:
+            try:
+                guids.add(SheetParser.parse_mvz_guid(plan.extract(row)["mvz_num"]))
+            except ValueError:
+                continue
+
+    return sorted(guids)
+
+
+def run_queries(connection: sqlite3.Connection, queries: list[tuple[str, list]]) -> list[tuple]:
+    rows = []
+    for sql, params in queries:
+        rows.extend(connection.execute(sql, params).fetchall())
+
+    return rows
+
+
+def write_arctos_csv(path: str, columns: list[str], rows: list[tuple]):
+    os.makedirs(os.path.dirname(path) or os.curdir, exist_ok=True)
+    with open(path, "w", encoding="utf8", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(columns)
+        writer.writerows(["" if value is None else value for value in row] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Loads an Arctos style flat/attributes database and times the reference queries against it')
+    parser.add_argument('--database', type=str, default=None, help="SQLite file to build, kept in memory when not given")
+    parser.add_argument('--flat', type=str, default=None, help="CSV export of the Arctos flat table, synthetic data is used when not given")
+    parser.add_argument('--attributes', type=str, default=None, help="CSV export of the Arctos attributes table, needed with --flat")
+    parser.add_argument('--specimens', type=int, default=50000, help="Synthetic specimens in the flat table")
+    parser.add_argument('--fill_rate', type=float, default=0.6, help="Fraction of synthetic attributes with a value")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--input', type=str, default=None, help="Accession workbooks whose guids are pulled, a sample of flat is used when not given")
+    parser.add_argument('--sample', type=int, default=10000, help="Guids sampled from flat when --input is not given")
+    parser.add_argument('--config', type=str, default="config.json")
+    parser.add_argument('--guid_batch_size', type=int, default=GUID_BATCH_SIZE)
+    parser.add_argument('--output', type=str, default="./output/arctos_data.csv", help="Pulled reference data in the format main.py reads")
+    parser.add_argument('--results', type=str, default="arctos_query_benchmark.json")
+    args = parser.parse_args()
+
+    if (args.flat is None) != (args.attributes is None):
+        parser.error("--flat and --attributes must be given together")
+
+    times = StageTimes()
+    attributes = load_attributes(args.config)
+
+    if args.database is not None and os.path.exists(args.database):
+        os.remove(args.database)
+    connection = sqlite3.connect(args.database if args.database is not None else ":memory:")
+
+    if args.flat is not None:
+        times.run("load", lambda: (load_table(connection, "flat", args.flat), load_table(connection, "attributes", args.attributes)))
+    else:
+        times.run("generate", lambda: generate_tables(connection, args.specimens, args.fill_rate, random.Random(args.seed)))
+    times.run("index", lambda: create_indexes(connection))
+
+    if args.input is not None:
+        guids = workbook_guids(args.input)
+    else:
+        guids = [row[0] for row in connection.execute("SELECT guid FROM flat ORDER BY guid LIMIT ?", (args.sample,))]
+
+    pivot_queries = list(batched_queries(attributes, guids, args.guid_batch_size))
+    self_join_queries = [self_join_query(attributes, ARCTOS_FIELDS, [in_condition("flat.guid", batch)])
+                         for batch in (guids[start:start + args.guid_batch_size] for start in range(0, len(guids), args.guid_batch_size))]
+
+    with open(LEGACY_QUERY_PATH, "r", encoding="utf8") as query_file:
+        legacy_query = query_file.read()
+
+    times.run("legacy_file", lambda: connection.execute(legacy_query).fetchall(), rows=len)
+    self_join_rows = times.run("self_join", lambda: run_queries(connection, self_join_queries), rows=len)
+    pivot_rows = times.run("pivot", lambda: run_queries(connection, pivot_queries), rows=len)
+
+    # Single valued attributes give the same rows either way, anything else shows up here
+    matches = sorted(self_join_rows) == sorted(pivot_rows)
+    print(f"pivot matches self joins: {matches}")
+
+    columns = [field.split(".")[-1] for field in ARCTOS_FIELDS] + attributes
+    times.run("write", lambda: write_arctos_csv(args.output, columns, pivot_rows))
+    connection.close()
+
+    with open(args.results, "w", encoding="utf8") as results_file:
+        json.dump({
+            "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "results")},
+            "guids": len(guids),
+            "queries": len(pivot_queries),
+            "pivot_matches_self_join": matches,
+            "stages": times.stages,
+        }, results_file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
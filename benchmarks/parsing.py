@@ -0,0 +1,51 @@
+import argparse
+import random
+import time
+
+from ranges.sheets import SheetParser
+from ranges.units import DistanceUnit, WeightUnit
+
+# Approximate mix of cell values found in accession sheets
+DISTANCE_SAMPLES = ["mm", "in", "95", "41", "11", "6", "192", "216", "14 3/8", "4 5/8 ", "13+", "65*",
+                    "211mm", "211 mm", "1 1/8 in", "42 3/8", "5/8", "3.123", "not recorded"]
+WEIGHT_SAMPLES = ["g", "oz", "4", "41", "12.5", "65 oz", "3 oz", "4*", "?"]
+
+
+def generate_cells(samples, count, seed):
+    generator = random.Random(seed)
+    return [generator.choice(samples) if generator.random() < 0.8 else str(generator.randint(1, 400))
+            for _ in range(count)]
+
+
+def time_call(label, count, function):
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {count / elapsed:>12,.0f} cells/s ({elapsed:.3f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reports measurement parsing throughput')
+    parser.add_argument('--cells', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    distance_cells = generate_cells(DISTANCE_SAMPLES, args.cells, args.seed)
+    weight_cells = generate_cells(WEIGHT_SAMPLES, args.cells, args.seed)
+
+    time_call("DistanceUnit.split_value", args.cells,
+              lambda: [DistanceUnit.split_value(cell) for cell in distance_cells])
+    time_call("WeightUnit.split_value", args.cells,
+              lambda: [WeightUnit.split_value(cell) for cell in weight_cells])
+    time_call("DistanceUnit.from_string", args.cells,
+              lambda: [DistanceUnit.from_string(cell) for cell in ["mm", "in", "in.", "cm"] * (args.cells // 4)])
+    time_call("SheetParser.parse_mvz_guid", args.cells,
+              lambda: [SheetParser.parse_mvz_guid(str(index)) for index in range(args.cells)])
+    time_call("SheetParser.parse_numerical_attribute", args.cells,
+              lambda: [SheetParser.parse_numerical_attribute(cell, None, DistanceUnit.MILLIMETERS) for cell in distance_cells])
+
+    print(SheetParser.parse_decimal_text.cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+
+import main
+
+from benchmarks.synthetic import ARCTOS_ATTRIBUTES, generate_arctos_csv, generate_workbook
+from ranges.arctos import ArctosStore
+from ranges.attributes import NUMERICAL_COLUMNS, TEXT_COLUMNS, write_rows
+from ranges.sheets import SheetParser
+from ranges.specimen import Specimen
+from ranges.workbooks import read_sheet
+
+
+class StageTimes:
+    def __init__(self):
+        self.stages = {}
+
+    def run(self, name, function, rows=None):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+
+        count = rows(result) if rows is not None else None
+        self.stages[name] = {
+            "seconds": elapsed,
+            "rows": count,
+            "rows_per_second": count / elapsed if count and elapsed > 0 else None,
+        }
+        print(f"{name:<16} {elapsed:>8.3f}s" + (f" {count:>10,} rows" if count is not None else ""))
+
+        return result
+
+
+def generate_inputs(directory, workbooks, rows, messiness, fill_rate, seed):
+    generator = random.Random(seed)
+
+    data_directory = os.path.join(directory, "data")
+    os.makedirs(data_directory, exist_ok=True)
+
+    accession_files = []
+    guids = []
+    for index in range(workbooks):
+        accession_file = os.path.join(data_directory, f"{14000 + index}.xlsx")
+        guids.extend(generate_workbook(accession_file, 100000 + index * rows, rows, messiness, generator))
+        accession_files.append(accession_file)
+
+    arctos_csv = os.path.join(directory, "arctos_data.csv")
+    generate_arctos_csv(arctos_csv, guids, fill_rate, generator)
+
+    return accession_files, arctos_csv
+
+
+def read_stage(accession_files):
+    sheets = []
+    for accession_file in accession_files:
+        columns, rows = read_sheet(accession_file)
+        sheets.append((columns, list(rows)))
+
+    return sheets
+
+
+def parse_stage(sheets):
+    specimens = []
+    review_needed = []
+    for columns, rows in sheets:
+        plan = SheetParser.compile_header(columns)
+        for start in range(0, len(rows), main.PARSE_BATCH_SIZE):
+            records = [plan.extract(row) for row in rows[start:start + main.PARSE_BATCH_SIZE]]
+            batch_specimens, batch_review_needed = Specimen.from_records(records)
+            specimens.extend(batch_specimens)
+            review_needed.extend(batch_review_needed)
+
+    return specimens, review_needed
+
+
+def run_benchmark(args, directory):
+    times = StageTimes()
+
+    accession_files, arctos_csv = times.run(
+        "generate", lambda: generate_inputs(directory, args.workbooks, args.rows, args.messiness, args.fill_rate, args.seed))
+
+    sheets = times.run("read", lambda: read_stage(accession_files), rows=lambda result: sum(len(rows) for _, rows in result))
+    specimens, _ = times.run("parse", lambda: parse_stage(sheets), rows=lambda result: len(result[0]))
+    del sheets
+
+    store_path = os.path.join(directory, "arctos_data.sqlite")
+    arctos_data = times.run("arctos_load", lambda: ArctosStore.open(arctos_csv, store_path, ARCTOS_ATTRIBUTES))
+
+    attributes, unitless_attributes = times.run(
+        "export", lambda: main.get_attributes(specimens, arctos_data), rows=lambda result: len(result[0]) + len(result[1]))
+
+    # Duplicate removal and the arctos filter run as one fused pass in main
+    seen = set()
+    unknown_guids = set()
+    selected = times.run(
+        "dedupe_filter",
+        lambda: (main.select_new_attributes(attributes, arctos_data, seen, unknown_guids),
+                 main.select_new_attributes(unitless_attributes, arctos_data, seen, unknown_guids)),
+        rows=lambda result: len(result[0]) + len(result[1]))
+
+    def write_stage():
+        write_rows(os.path.join(directory, "numerical_attributes.csv"), NUMERICAL_COLUMNS, selected[0])
+        write_rows(os.path.join(directory, "text_attributes.csv"), TEXT_COLUMNS, selected[1])
+        return selected
+
+    times.run("write", write_stage, rows=lambda result: len(result[0]) + len(result[1]))
+
+    arctos_data.close()
+    return times.stages
+
+
+def compare(stages, baseline_path):
+    with open(baseline_path, "r", encoding="utf8") as baseline_file:
+        baseline = json.load(baseline_file)
+
+    print("\nstage            baseline   current   ratio")
+    for name, stage in stages.items():
+        if name in baseline["stages"]:
+            before = baseline["stages"][name]["seconds"]
+            print(f"{name:<16} {before:>8.3f}s {stage['seconds']:>8.3f}s {stage['seconds'] / before:>7.2f}x")
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description='Times each stage of the accession to Arctos pipeline on synthetic data')
+    parser.add_argument('--workbooks', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=2500, help="Rows per synthetic workbook")
+    parser.add_argument('--messiness', type=float, default=0.3, help="Fraction of cells given aliases, fractions, units or markers")
+    parser.add_argument('--fill_rate', type=float, default=0.3, help="Fraction of attributes already present in the Arctos csv")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', type=str, default=None, help="Keep generated inputs and outputs in this directory")
+    parser.add_argument('--output', type=str, default="pipeline_benchmark.json")
+    parser.add_argument('--baseline', type=str, default=None, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    if args.workdir is not None:
+        os.makedirs(args.workdir, exist_ok=True)
+        stages = run_benchmark(args, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            stages = run_benchmark(args, directory)
+
+    results = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "workdir")},
+        "stages": stages,
+    }
+
+    with open(args.output, "w", encoding="utf8") as output_file:
+        json.dump(results, output_file, indent=4)
+
+    if args.baseline is not None:
+        compare(stages, args.baseline)
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,105 @@
+import csv
+import random
+
+import openpyxl
+
+from ranges.sheets import SheetParser
+
+ARCTOS_ATTRIBUTES = ["total length", "tail length", "hind foot with claw", "ear from notch", "ear from crown",
+                     "weight", "crown-rump length", "reproductive data", "unformatted measurements"]
+
+COLLECTORS = ["James L. Patton", "Richard M. Warner", "Tokay Alberts", None]
+NOT_RECORDED = ["not recorded", "Not Recorded", "?", "no data", ""]
+REPRO_COMMENTS = ["T 3x2", "post lactating, scars 2R-1L", "nulliparous", "scrotal", None, None]
+UNFORMATTED = ["Rt. side eaten by Siphid beetle in trap", "skull only", None, None, None, None]
+
+
+def header_for(generator: random.Random, messiness: float) -> dict[str, str]:
+    header = {}
+    for expected_column in SheetParser.expected_columns:
+        valid_names = expected_column["valid_names"]
+        header[expected_column["column_name"]] = generator.choice(valid_names) if generator.random() < messiness else valid_names[0]
+
+    return header
+
+
+def measurement(generator: random.Random, messiness: float, low: int, high: int, suffixes: list[str]) -> str:
+    value = generator.randint(low, high)
+
+    if generator.random() >= messiness:
+        return str(value)
+
+    choice = generator.random()
+    if choice < 0.3:
+        return generator.choice(NOT_RECORDED)
+    if choice < 0.5:
+        return f"{value} {generator.randint(1, 7)}/8"
+    if choice < 0.7:
+        return f"{value}{generator.choice(['', ' '])}{generator.choice(suffixes)}"
+    if choice < 0.8:
+        return f"{value}{generator.choice(['+', '*'])}"
+    if choice < 0.9:
+        return f"{value}.{generator.randint(0, 9)}"
+
+    return None
+
+
+def generate_workbook(path: str, first_catalog_number: int, rows: int, messiness: float, generator: random.Random) -> list[str]:
+    header = header_for(generator, messiness)
+
+    ear_column = "ear" if generator.random() < 0.5 else "ear_from_notch"
+    columns = [column_name for column_name in header
+               if column_name not in ("ear", "ear_from_notch") or column_name == ear_column]
+
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append([header[column_name] for column_name in columns])
+
+    guids = []
+    for index in range(rows):
+        catalog_number = first_catalog_number + index
+        guids.append(f"MVZ:Mamm:{catalog_number}")
+
+        inches = generator.random() < messiness * 0.2
+        ounces = generator.random() < messiness * 0.1
+        values = {
+            "mvz_num": generator.choice([str(catalog_number), catalog_number, f"MVZ:Mamm:{catalog_number}"]),
+            "collector": generator.choice(COLLECTORS),
+            "date": None,
+            "total_length": measurement(generator, messiness, 80, 250, ["mm", "in"]),
+            "tail_length": measurement(generator, messiness, 30, 120, ["mm", "in"]),
+            "hind_foot_with_claw": measurement(generator, messiness, 10, 40, ["mm"]),
+            "ear": measurement(generator, messiness, 5, 25, ["mm"]),
+            "ear_from_notch": measurement(generator, messiness, 5, 25, ["mm"]),
+            "ear_from_crown": measurement(generator, messiness, 5, 25, ["mm"]) if generator.random() < 0.2 else None,
+            "distance_unit": "in" if inches else generator.choice([None, "mm"]),
+            "weight": measurement(generator, messiness, 3, 90, ["g", "oz"]),
+            "weight_unit": "oz" if ounces else "g",
+            "repro_comments": generator.choice(REPRO_COMMENTS),
+            "testes_length": measurement(generator, messiness, 2, 15, ["mm"]) if generator.random() < 0.4 else None,
+            "testes_width": measurement(generator, messiness, 1, 10, ["mm"]) if generator.random() < 0.4 else None,
+            "embryo_count": str(generator.randint(1, 8)) if generator.random() < 0.1 else None,
+            "embryo_count_left": None,
+            "embryo_count_right": None,
+            "crown_rump_length": measurement(generator, messiness, 5, 30, ["mm"]) if generator.random() < 0.1 else None,
+            "scars": None,
+            "unformatted_measurements": generator.choice(UNFORMATTED),
+            "review_needed": "check measurements" if generator.random() < messiness * 0.01 else None,
+        }
+
+        worksheet.append([values[column_name] for column_name in columns])
+
+    workbook.save(path)
+    return guids
+
+
+def generate_arctos_csv(path: str, guids: list[str], fill_rate: float, generator: random.Random):
+    with open(path, "w", encoding="utf8", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["collection_object_id", "guid", "ended_date", "collectors"] + ARCTOS_ATTRIBUTES)
+
+        for index, guid in enumerate(guids):
+            collectors = generator.choice(["James L. Patton", "Richard M. Warner, James L. Patton", ""])
+            attribute_values = [str(generator.randint(1, 200)) if generator.random() < fill_rate else ""
+                                for _ in ARCTOS_ATTRIBUTES]
+            writer.writerow([index, guid, "2009-09-15", collectors] + attribute_values)
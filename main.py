@@ -1,84 +1,278 @@
 import argparse
+import collections
+import cProfile
 import glob
+import itertools
 import logging
+import pstats
+
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
 
+from ranges.arctos import ArctosStore
+from ranges.attributes import AttributeColumns, AttributeWriter, NUMERICAL_COLUMNS, TEXT_COLUMNS
+from ranges.cache import ParseCache
+from ranges.instrumentation import RunReport
+from ranges.intermediate import copy_arctos_reference, load_arctos_reference, load_specimens, save_arctos_reference, save_specimens
+from ranges.query_builder import GUID_BATCH_SIZE, batched_queries, load_attributes, write_queries
 from ranges.sheets import SheetParser
-from ranges.specimen import Specimen, ReviewNeededException
+from ranges.specimen import Specimen
+from ranges.workbooks import read_headers, read_sheet
 
 logger = logging.getLogger(__name__)
 
-def import_excel(file_name):
-    accession_data = pd.read_excel(file_name, dtype=str)
-    accession_data = accession_data.to_dict(orient="records")
+# Rows are parsed in batches so measurement columns can be parsed column-wise
+PARSE_BATCH_SIZE = 1000
+
+# Specimens exported at a time, bounds the attribute rows held in memory before they reach the writers
+EXPORT_CHUNK_SIZE = 1000
+
+# An attribute is a duplicate when another row has the same guid and attribute type
+KEY_COLUMNS = ["guid", "attribute_type"]
+
+def iter_excel(file_name, sheet_name=None, report=None):
+    if report is None:
+        report = RunReport()
+
+    with report.stage("open_workbook"):
+        columns, rows = read_sheet(file_name, sheet_name)
 
-    if len(accession_data) == 0:
+    if len(columns) == 0:
         return
 
-    missing_columns = SheetParser.verify_columns_exist(accession_data[0].keys())
+    missing_columns = SheetParser.verify_columns_exist(columns)
     if len(missing_columns) > 0:
         print(f"Missing columns in {file_name}", missing_columns)
 
+    # Column aliases are resolved once per sheet, each row is then a plain projection
+    plan = SheetParser.compile_header(columns)
+
+    while True:
+        with report.stage("read"):
+            batch = list(itertools.islice(rows, PARSE_BATCH_SIZE))
+
+        if len(batch) == 0:
+            break
+
+        with report.stage("parse"):
+            specimens, review_needed = Specimen.from_records([plan.extract(row) for row in batch])
+
+        report.count("rows", len(batch))
+        report.count("specimens", len(specimens))
+        report.count("review_needed", len(review_needed))
+
+        for specimen in specimens:
+            specimen.sheet_name = sheet_name
+            yield specimen, None
+        for guid, reason in review_needed:
+            yield None, (guid, reason, sheet_name)
+
+
+def import_excel(file_name, sheet_name=None, report=None):
     review_needed = []
     specimens = []
-    for raw_record in accession_data:
-        try:
-            specimen = Specimen.from_raw_record(raw_record)
+    for specimen, review in iter_excel(file_name, sheet_name, report):
+        if review is None:
             specimens.append(specimen)
-        except ReviewNeededException as ex:
-            review_needed.append(ex.args)
+        else:
+            review_needed.append(review)
 
     return specimens, review_needed
 
 
+def import_excel_timed(file_name, sheet_name=None):
+    report = RunReport()
+    with report.stage("import_excel"):
+        specimens, review_needed = import_excel(file_name, sheet_name, report)
+
+    return specimens, review_needed, report.to_dict()
+
+
+def list_sheets(accession_files, headers, sheets=None):
+    # Each sheet is its own parse task, sheets outside the configured subset or missing required columns are skipped
+    tasks = []
+    for accession_file, file_headers in zip(accession_files, headers):
+        for sheet_name, columns in file_headers.items():
+            if sheets is not None and sheet_name not in sheets:
+                continue
+            if len(columns) == 0:
+                continue
+
+            try:
+                SheetParser.compile_header(columns)
+            except ValueError as err:
+                print(f"Skipping {accession_file} [{sheet_name}]", err.args[0], err.args[1])
+                continue
+
+            tasks.append((accession_file, sheet_name))
+
+    return tasks
+
+
+def import_accessions(accession_files, workers=1, cache=None, report=None, sheets=None):
+    if report is None:
+        report = RunReport()
+
+    specimens = []
+    review_needed = {}
+
+    # Worker processes only start once something is submitted, a single sheet never pays for them
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    try:
+        with report.stage("scan_headers"):
+            # Unchanged workbooks reuse their cached sheet list, only new or changed files are opened
+            headers = {accession_file: cache.load_headers(accession_file) if cache is not None else None
+                       for accession_file in accession_files}
+            unread_files = [accession_file for accession_file in accession_files if headers[accession_file] is None]
+
+            mapper = executor.map if executor is not None and len(unread_files) > 1 else map
+            for accession_file, file_headers in zip(unread_files, mapper(read_headers, unread_files)):
+                headers[accession_file] = file_headers
+                if cache is not None:
+                    cache.store_headers(accession_file, file_headers)
+
+            tasks = list_sheets(accession_files, [headers[accession_file] for accession_file in accession_files], sheets)
+        report.count("sheets", len(tasks))
+
+        cached = {}
+        if cache is not None:
+            with report.stage("cache_lookup"):
+                for task in tasks:
+                    cached_result = cache.load(*task)
+                    if cached_result is not None:
+                        cached[task] = cached_result
+
+        pending_tasks = [task for task in tasks if task not in cached]
+
+        if executor is not None and len(pending_tasks) > 1:
+            # executor.map yields results in submission order, so the merge matches the serial run
+            results = iter(list(executor.map(import_excel_timed, *zip(*pending_tasks))))
+        else:
+            results = (import_excel_timed(*task) for task in pending_tasks)
+
+        for task in tasks:
+            accession_file, sheet_name = task
+            label = f"{accession_file} [{sheet_name}]"
+
+            if task in cached:
+                sheet_specimens, sheet_review_needed = cached[task]
+                print(f"{label} (cached)")
+
+                report.count("cached_sheets")
+                report.files[label] = {"cached": True, "specimens": len(sheet_specimens)}
+            else:
+                sheet_specimens, sheet_review_needed, sheet_report = next(results)
+                elapsed = sheet_report["stages"]["import_excel"]["seconds"]
+                print(f"{label} ({elapsed:.2f}s)")
+
+                report.merge(sheet_report)
+                report.files[label] = {
+                    "cached": False,
+                    "seconds": elapsed,
+                    "rows": sheet_report["counters"].get("rows", 0),
+                    "specimens": len(sheet_specimens),
+                    # Lifetime peak of the process that parsed the sheet, not the sheet's own footprint
+                    "worker_peak_rss_mb": sheet_report["peak_rss_mb"],
+                }
+
+                if cache is not None:
+                    with report.stage("cache_store"):
+                        cache.store(accession_file, sheet_name, sheet_specimens, sheet_review_needed)
+
+            specimens.extend(sheet_specimens)
+            review_needed.setdefault(accession_file, []).extend(sheet_review_needed)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return specimens, review_needed
+
+
+def export_specimen(specimen, arctos_data, attributes, unitless_attributes):
+    reference = arctos_data.get(specimen.guid, ("collectors", "ended_date"))
+
+    if reference is not None:
+        collectors, ended_date = reference
+        if specimen.collectors is None:
+            specimen.collectors = collectors.split(",")[0]
+
+        specimen.collected_date = ended_date
+
+    specimen.export_attributes_to(attributes, unitless_attributes)
+
+
 def get_attributes(specimens, arctos_data):
-    attributes = []
-    unitless_attributes = []
+    attributes = AttributeColumns(NUMERICAL_COLUMNS)
+    unitless_attributes = AttributeColumns(TEXT_COLUMNS)
 
     for specimen in specimens:
-        if specimen.collectors is None and specimen.guid in arctos_data:
-            specimen.collectors = arctos_data[specimen.guid]["collectors"].split(",")[0]
+        export_specimen(specimen, arctos_data, attributes, unitless_attributes)
 
-        specimen.collected_date = arctos_data[specimen.guid]["ended_date"]
+    return attributes, unitless_attributes
 
-        specimen_attributes, specimen_unitless_attributes = specimen.export_attributes()
 
-        attributes.extend(specimen_attributes)
-        unitless_attributes.extend(specimen_unitless_attributes)
+def export_new_attributes(specimens, arctos_data, numerical_writer, text_writer, attribute_counts, guids):
+    # One pass over the specimens, each chunk is exported, filtered and handed to both writer threads
+    seen = set()
+    unknown_guids = set()
+    exported = 0
 
-    return attributes, unitless_attributes
+    for start in range(0, len(specimens), EXPORT_CHUNK_SIZE):
+        attributes, unitless_attributes = get_attributes(specimens[start:start + EXPORT_CHUNK_SIZE], arctos_data)
+        exported += len(attributes) + len(unitless_attributes)
 
+        numerical_writer.write_rows(count_attributes(select_new_attributes(attributes, arctos_data, seen, unknown_guids), attribute_counts, guids))
+        text_writer.write_rows(count_attributes(select_new_attributes(unitless_attributes, arctos_data, seen, unknown_guids), attribute_counts, guids))
 
-def eliminate_duplicates(attributes):
-    existing_records = set()
+    if len(unknown_guids) > 0:
+        logger.warning("%d guids not found in arctos data: %s", len(unknown_guids), ", ".join(sorted(unknown_guids)))
 
-    result = []
-    for attribute in attributes:
-        key = f"{attribute['guid']}_{attribute['attribute_type']}"
-        if key in existing_records:
-            logger.warning("Duplicate entries found for guid: %s, attribute: %s", attribute["guid"], attribute["attribute_type"])
-        else:
-            existing_records.add(key)
-            result.append(attribute)
-    
-    return result
+    return exported
+
+
+def select_new_attributes(attributes, arctos_data, seen, unknown_guids):
+    # Duplicates are dropped in row order against one set of keys kept over the whole run
+    guids = []
+    attribute_types = []
+    positions = []
+    for position, key in enumerate(zip(attributes.columns["guid"], attributes.columns["attribute_type"])):
+        if key in seen:
+            logger.warning("Duplicate entries found for guid: %s, attribute: %s", *key)
+            continue
+
+        seen.add(key)
+        guids.append(key[0])
+        attribute_types.append(key[1])
+        positions.append(position)
+
+    if len(positions) == 0:
+        return []
+
+    # One anti-join against the arctos presence table keeps only attributes arctos has no value for
+    candidates = pd.DataFrame({"guid": guids, "attribute_type": attribute_types, "position": positions})
+    presence = arctos_data.presence(list(dict.fromkeys(guids)), list(dict.fromkeys(attribute_types)))
+    merged = candidates.merge(presence, on=KEY_COLUMNS, how="left")
+
+    # Known guids have a presence row for every requested attribute, so a missing match means the guid is unknown
+    unknown_guids.update(merged.loc[merged["has_value"].isna(), "guid"])
+
+    columns = [attributes.columns[name] for name in attributes.names]
+    return [tuple(column[position] for column in columns) for position in merged.loc[merged["has_value"].eq(False), "position"]]
 
-def filter_attributes(attributes, arctos_data):
-    filtered_attributes = []
-    for attribute in attributes:
-        if attribute["guid"] not in arctos_data:
-            logger.warning("Guid: %s not found in arctos data!", attribute["guid"])
-        elif arctos_data[attribute["guid"]][attribute["attribute_type"]] is None or arctos_data[attribute["guid"]][attribute["attribute_type"]] == "":
-            filtered_attributes.append(attribute)
 
-    return filtered_attributes
+def count_attributes(rows, attribute_counts, guids):
+    for row in rows:
+        guids.add(row[0])
+        attribute_counts[row[1]] += 1
+        yield row
 
 
-def summarize_data(attributes):
+def summarize_data(attribute_counts, guids):
     total_attribute_counts = {
-        "specimens": len(set([attribute["guid"] for attribute in attributes])),
-        "total attributes": len(attributes),
+        "specimens": len(guids),
+        "total attributes": sum(attribute_counts.values()),
         "total length": 0,
         "tail length": 0,
         "hind foot with claw": 0,
@@ -90,12 +284,91 @@ def summarize_data(attributes):
         "unformatted measurements": 0,
     }
 
-    for attribute in attributes:
-        total_attribute_counts[attribute["attribute_type"]] = total_attribute_counts[attribute["attribute_type"]] + 1
+    for attribute_type, count in attribute_counts.items():
+        total_attribute_counts[attribute_type] = total_attribute_counts[attribute_type] + count
 
     return total_attribute_counts
 
 
+def run(args, report):
+    accession_files = glob.glob(args.input)
+    accession_files.sort()
+    report.count("files", len(accession_files))
+
+    # Import all specimens from Excel files, or from the tables saved by an earlier run
+    with report.stage("import"):
+        if args.load_intermediates is not None:
+            specimens, review_needed = load_specimens(args.load_intermediates)
+        else:
+            cache = ParseCache(args.cache_dir, read=not args.no_cache)
+            specimens, review_needed = import_accessions(accession_files, workers=args.workers, cache=cache, report=report,
+                                                         sheets=args.sheets)
+
+    if args.save_intermediates is not None:
+        with report.stage("save_intermediates"):
+            save_specimens(args.save_intermediates, specimens, review_needed)
+
+    # Export review needed files
+    with report.stage("write_review_needed"):
+        review_needed_csv = []
+        for key, value in review_needed.items():
+            if len(value) > 0:
+                for specimen in value:
+                    review_needed_csv.append({
+                        "sheet": key,
+                        "sheet_name": specimen[2],
+                        "guid": specimen[0],
+                        "reason": specimen[1]
+                    })
+
+        if len(review_needed_csv) > 0:
+            logger.warning("Review Needed")
+
+        review_needed_csv = pd.DataFrame.from_records(review_needed_csv)
+        review_needed_csv.to_csv(f"./output/{args.output_prefix}review_needed.csv", index=False)
+        
+    # Export the list of guids for arctos data input, and batched queries which pull the arctos data for them
+    with report.stage("write_arctos_queries"):
+        specimen_guids = sorted(set(specimen.guid for specimen in specimens))
+        with open(f"./output/{args.output_prefix}required_guids.txt", "w", encoding="utf8") as guids_file:
+            guids_file.write(", ".join([f"'{specimen_guid}'" for specimen_guid in specimen_guids]))
+
+        queries = batched_queries(load_attributes(args.config), (specimen.guid for specimen in specimens), args.guid_batch_size)
+        write_queries(f"./output/{args.output_prefix}arctos_queries.sql", queries)
+    
+    # Import arctos data, the indexed store is only rebuilt when the csv changes
+    with report.stage("arctos_load"):
+        if args.load_intermediates is not None:
+            arctos_data = load_arctos_reference(args.load_intermediates)
+        else:
+            arctos_data = ArctosStore.open(args.arctos_data, args.arctos_store, load_attributes(args.config))
+
+    if args.save_intermediates is not None:
+        with report.stage("save_intermediates"):
+            if args.load_intermediates is not None:
+                copy_arctos_reference(args.load_intermediates, args.save_intermediates)
+            else:
+                save_arctos_reference(args.save_intermediates, arctos_data)
+
+    # Export attributes, dropping duplicates and attributes already in arctos, while both files are written
+    attribute_counts = collections.Counter()
+    guids = set()
+    extension = ".csv.gz" if args.gzip else ".csv"
+
+    with report.stage("export_and_write"):
+        with AttributeWriter(f"./output/{args.output_prefix}numerical_attributes{extension}", NUMERICAL_COLUMNS, args.gzip) as numerical_writer, \
+                AttributeWriter(f"./output/{args.output_prefix}text_attributes{extension}", TEXT_COLUMNS, args.gzip) as text_writer:
+            exported = export_new_attributes(specimens, arctos_data, numerical_writer, text_writer, attribute_counts, guids)
+    report.count("exported_attributes", exported)
+    report.count("written_attributes", sum(attribute_counts.values()))
+
+    # Print summary of data
+    summary = summarize_data(attribute_counts, guids)
+    print(summary)
+
+    arctos_data.close()
+
+
 def main():
     parser = argparse.ArgumentParser(
                     prog='Arctosify',
@@ -103,71 +376,36 @@ def main():
     
     parser.add_argument('--arctos_data', type=str, default="arctos\\arctos_data.csv")
     parser.add_argument('--input', type=str, default=".\\data\\*.xlsx")
+    parser.add_argument('--arctos_store', type=str, default=None, help="SQLite index built from --arctos_data, defaults to a .sqlite file beside it")
     parser.add_argument('--output_prefix', type=str, default="")
+    parser.add_argument('--gzip', action="store_true", help="Write the attribute files gzip compressed")
+    parser.add_argument('--config', type=str, default="config.json", help="Holds the attribute list used for the arctos queries")
+    parser.add_argument('--guid_batch_size', type=int, default=GUID_BATCH_SIZE, help="Guids per generated arctos query")
+    parser.add_argument('--workers', type=int, default=1, help="Number of processes used to parse accession workbooks")
+    parser.add_argument('--sheets', type=str, nargs="*", default=None, help="Only parse sheets with these names, every sheet is parsed by default")
+    parser.add_argument('--cache_dir', type=str, default="./output/.parse_cache", help="Directory holding parsed workbooks from earlier runs")
+    parser.add_argument('--no-cache', dest="no_cache", action="store_true", help="Re-parse every workbook, ignoring cached results")
+    parser.add_argument('--save_intermediates', type=str, default=None, help="Directory to save the parsed specimens and arctos data to as Parquet, needs pyarrow")
+    parser.add_argument('--load_intermediates', type=str, default=None, help="Directory of Parquet tables from --save_intermediates used instead of the workbooks and arctos csv")
+    parser.add_argument('--profile', action="store_true", help="Write cProfile stats for the main process to the output directory")
     
     args = parser.parse_args()
 
-    accession_files = glob.glob(args.input)
-    accession_files.sort()
+    report = RunReport()
 
-    # Import all specimens from Excel files
-    specimens = []
-    review_needed = {}
-    for accession_file in accession_files:
-        print(accession_file)
-        file_specimens, review_needed[accession_file] = import_excel(file_name=accession_file)
-        specimens.extend(file_specimens)
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
 
-    # Export review needed files
-    review_needed_csv = []
-    for key, value in review_needed.items():
-        if len(value) > 0:
-            for specimen in value:
-                review_needed_csv.append({
-                    "sheet": key,
-                    "guid": specimen[0],
-                    "reason": specimen[1]
-                })
-
-    if len(review_needed_csv) > 0:
-        logger.warning("Review Needed")
-
-    review_needed_csv = pd.DataFrame.from_records(review_needed_csv)
-    review_needed_csv.to_csv(f"./output/{args.output_prefix}review_needed.csv", index=False)
-        
-    # Export list of guids for arctos data input
-    specimen_guids = set(specimen.guid for specimen in specimens)
-    with open(f"./output/{args.output_prefix}required_guids.txt", "w", encoding="utf8") as guids_file:
-        guids_file.write(", ".join([f"'{specimen_guid}'" for specimen_guid in specimen_guids]))
-    
-    # Import arctos data
-    arctos_data = pd.read_csv(args.arctos_data, dtype=str)
-    arctos_data = arctos_data.fillna("")
-    arctos_data = arctos_data.to_dict(orient="records")
-    arctos_data = {record["guid"]: record for record in arctos_data}
-
-    # Get all attribute data
-    attributes, unitless_attributes = get_attributes(specimens, arctos_data)
-
-    # Check for and eliminate duplicates
-    attributes = eliminate_duplicates(attributes)
-    unitless_attributes = eliminate_duplicates(unitless_attributes)
-
-    # Filter out attributes which were found in arctos already
-    attributes = filter_attributes(attributes, arctos_data)
-    unitless_attributes = filter_attributes(unitless_attributes, arctos_data)
-
-    # Save data to files
-    csv_dataframe = pd.DataFrame.from_records(attributes)
-    csv_dataframe.to_csv(f"./output/{args.output_prefix}numerical_attributes.csv", index=False)
-    
-    csv_dataframe = pd.DataFrame.from_records(unitless_attributes)
-    csv_dataframe.to_csv(f"./output/{args.output_prefix}text_attributes.csv", index=False)
+    run(args, report)
 
-    # Print summary of data
-    summary = summarize_data(attributes + unitless_attributes)
-    print(summary)
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(f"./output/{args.output_prefix}profile.pstats")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+    report.write(f"./output/{args.output_prefix}run_report.json", arguments=vars(args))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,190 @@
+import csv
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+from ranges.cache import hash_file
+from ranges.workbooks import NA_VALUES
+
+# Rows inserted per executemany call while building the store
+INSERT_BATCH_SIZE = 10000
+
+# Guids per query when reading presence for a chunk of attributes, stays under SQLite's variable limit
+LOOKUP_BATCH_SIZE = 500
+
+# Bump whenever the store layout changes, older stores are rebuilt
+STORE_VERSION = 3
+
+# Columns every run reads, attribute columns are added to these when the store is limited
+REFERENCE_COLUMNS = ("guid", "collectors", "ended_date")
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def melt_presence(frame: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    # One (guid, attribute_type, has_value) row per reference cell, ready to join against exported attributes
+    presence = frame.melt(id_vars="guid", value_vars=list(columns), var_name="attribute_type", value_name="value")
+    presence["has_value"] = presence["value"].notna() & (presence["value"] != "")
+
+    return presence[["guid", "attribute_type", "has_value"]]
+
+
+class ArctosStore:
+    connection: sqlite3.Connection
+    columns: list[str]
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.columns = [row[1] for row in connection.execute("PRAGMA table_info(arctos_data)")]
+        self._column_set = set(self.columns)
+
+    @staticmethod
+    def open(csv_path: str, store_path: str = None, attributes: list[str] = None) -> "ArctosStore":
+        if store_path is None:
+            store_path = os.path.splitext(csv_path)[0] + ".sqlite"
+
+        columns = None if attributes is None else list(REFERENCE_COLUMNS) + [attribute for attribute in attributes
+                                                                             if attribute not in REFERENCE_COLUMNS]
+
+        if not ArctosStore.is_current(store_path, csv_path, columns):
+            ArctosStore.build(csv_path, store_path, columns)
+
+        return ArctosStore(sqlite3.connect(store_path))
+
+    @staticmethod
+    def read_metadata(connection: sqlite3.Connection) -> dict:
+        try:
+            return {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM metadata")}
+        except sqlite3.DatabaseError:
+            return {}
+
+    @staticmethod
+    def is_current(store_path: str, csv_path: str, columns: list[str] = None) -> bool:
+        if not os.path.exists(store_path):
+            return False
+
+        connection = sqlite3.connect(store_path)
+        try:
+            metadata = ArctosStore.read_metadata(connection)
+            if metadata.get("version") != STORE_VERSION or metadata.get("requested_columns") != columns:
+                return False
+
+            source = os.stat(csv_path)
+            if source.st_size != metadata["source_size"]:
+                return False
+            if source.st_mtime_ns == metadata["source_mtime_ns"]:
+                return True
+
+            # A touched but unchanged csv keeps its store, only the recorded mtime moves on
+            if hash_file(csv_path) != metadata["source_sha256"]:
+                return False
+
+            connection.execute("UPDATE metadata SET value = ? WHERE key = 'source_mtime_ns'", (json.dumps(source.st_mtime_ns),))
+            connection.commit()
+            return True
+        finally:
+            connection.close()
+
+    @staticmethod
+    def build(csv_path: str, store_path: str, columns: list[str] = None):
+        temp_path = store_path + ".tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        # Taken before reading so a csv changed mid build is caught on the next run
+        source = os.stat(csv_path)
+        source_sha256 = hash_file(csv_path)
+
+        connection = None
+        try:
+            # utf-8-sig drops the byte order mark Excel writes, otherwise it ends up in the first column name
+            with open(csv_path, "r", encoding="utf-8-sig", newline="") as csv_file:
+                reader = csv.reader(csv_file)
+                header = next(reader)
+
+                if "guid" not in header:
+                    raise ValueError("Arctos data is missing the guid column", csv_path)
+
+                duplicates = sorted(set(column for column in header if header.count(column) > 1))
+                if len(duplicates) > 0:
+                    raise ValueError(f"Arctos data has duplicate columns: {', '.join(duplicates)}", csv_path)
+
+                connection = sqlite3.connect(temp_path)
+
+                # Only the requested columns present in the csv are kept, the rest of the export is dropped
+                indices = [index for index, column in enumerate(header) if columns is None or column in columns]
+                kept_columns = [header[index] for index in indices]
+
+                column_definitions = [f"{quote_identifier(column)} TEXT" + (" PRIMARY KEY" if column == "guid" else "")
+                                      for column in kept_columns]
+                connection.execute(f"CREATE TABLE arctos_data ({', '.join(column_definitions)})")
+
+                # Later rows for a guid replace earlier ones, the same as building a dict keyed on guid
+                insert = f"INSERT OR REPLACE INTO arctos_data VALUES ({', '.join('?' * len(kept_columns))})"
+
+                batch = []
+                for row in reader:
+                    if len(row) == 0:
+                        continue
+
+                    row = row[:len(header)] + [""] * (len(header) - len(row))
+                    batch.append(["" if row[index] in NA_VALUES else row[index] for index in indices])
+                    if len(batch) >= INSERT_BATCH_SIZE:
+                        connection.executemany(insert, batch)
+                        batch = []
+
+                connection.executemany(insert, batch)
+
+            metadata = {
+                "version": STORE_VERSION,
+                "requested_columns": columns,
+                "source_size": source.st_size,
+                "source_mtime_ns": source.st_mtime_ns,
+                "source_sha256": source_sha256,
+            }
+            connection.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)")
+            connection.executemany("INSERT INTO metadata VALUES (?, ?)", [(key, json.dumps(value)) for key, value in metadata.items()])
+
+            connection.commit()
+            connection.close()
+            connection = None
+
+            os.replace(temp_path, store_path)
+        finally:
+            # A build that fails part way leaves no open connection or half written store behind
+            if connection is not None:
+                connection.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def get(self, guid: str, columns: tuple[str]) -> tuple:
+        for column in columns:
+            if column not in self._column_set:
+                raise KeyError(column)
+
+        query = f"SELECT {', '.join(quote_identifier(column) for column in columns)} FROM arctos_data WHERE guid = ?"
+        return self.connection.execute(query, (guid,)).fetchone()
+
+    def presence(self, guids: list[str], columns: list[str]) -> pd.DataFrame:
+        for column in columns:
+            if column not in self._column_set:
+                raise KeyError(column)
+
+        select = ", ".join(quote_identifier(column) for column in ["guid", *columns])
+        rows = []
+        for start in range(0, len(guids), LOOKUP_BATCH_SIZE):
+            batch = guids[start:start + LOOKUP_BATCH_SIZE]
+            query = f"SELECT {select} FROM arctos_data WHERE guid IN ({', '.join('?' * len(batch))})"
+            rows.extend(self.connection.execute(query, batch).fetchall())
+
+        return melt_presence(pd.DataFrame.from_records(rows, columns=["guid", *columns]), columns)
+
+    def __contains__(self, guid: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM arctos_data WHERE guid = ?", (guid,)).fetchone() is not None
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,129 @@
+import csv
+import gzip
+import os
+import queue
+import threading
+
+NUMERICAL_COLUMNS = ("guid", "attribute_type", "attribute_value", "attribute_units",
+                     "attribute_date", "attribute_remark", "attribute_determiner")
+TEXT_COLUMNS = ("guid", "attribute_type", "attribute_value", "attribute_date", "attribute_determiner")
+
+# Rows handed to a writer thread at a time, and how many handed off chunks may wait before the producer blocks
+WRITE_CHUNK_SIZE = 5000
+WRITE_QUEUE_SIZE = 8
+
+
+class AttributeColumns:
+    names: tuple[str]
+    columns: dict[str, list]
+
+    def __init__(self, names: tuple[str]):
+        self.names = names
+        self.columns = {name: [] for name in names}
+        self._appenders = [self.columns[name].append for name in names]
+
+    def append(self, *values):
+        for append, value in zip(self._appenders, values):
+            append(value)
+
+    def __len__(self) -> int:
+        return len(self.columns[self.names[0]])
+
+    def rows(self):
+        return zip(*(self.columns[name] for name in self.names))
+
+    def to_records(self) -> list[dict]:
+        return [dict(zip(self.names, row)) for row in self.rows()]
+
+
+class AttributeWriter:
+    path: str
+    names: tuple[str]
+    compress: bool
+    rows_written: int
+
+    def __init__(self, path: str, names: tuple[str], compress: bool = False, chunk_size: int = WRITE_CHUNK_SIZE):
+        self.path = path
+        self.names = names
+        self.compress = compress
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+
+        # Rows go to a temporary file which only replaces the output once everything is written
+        self._temp_path = path + ".tmp"
+        self._buffer = []
+        self._queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        if self.compress:
+            return gzip.open(self._temp_path, "wt", encoding="utf8", newline="")
+
+        return open(self._temp_path, "w", encoding="utf8", newline="")
+
+    def _run(self):
+        try:
+            with self._open() as csv_file:
+                # Matches the dialect pandas.DataFrame.to_csv used for these files
+                writer = csv.writer(csv_file, lineterminator=os.linesep)
+                writer.writerow(self.names)
+
+                for chunk in iter(self._queue.get, None):
+                    writer.writerows(chunk)
+        except Exception as err:
+            self._error = err
+            for _ in iter(self._queue.get, None):
+                pass
+
+    def _flush(self):
+        if len(self._buffer) > 0:
+            self._queue.put(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+
+    def write(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.chunk_size:
+            self._flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def _finish(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def close(self):
+        self._flush()
+        self._finish()
+
+        if self._error is not None:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+            raise self._error
+
+        os.replace(self._temp_path, self.path)
+
+    def abort(self):
+        self._buffer = []
+        self._finish()
+
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_rows(path: str, names: tuple[str], rows, compress: bool = False):
+    with AttributeWriter(path, names, compress) as writer:
+        writer.write_rows(rows)
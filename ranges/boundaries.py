@@ -0,0 +1,130 @@
+import collections
+import json
+import math
+
+import numpy as np
+
+# Grid cell size in degrees used to bucket boundary bounding boxes
+DEFAULT_CELL_SIZE = 1.0
+
+# Polygon edges tested against a block of points at once, bounds the temporary arrays
+EDGE_CHUNK_SIZE = 1024
+
+
+def point_in_rings(longitudes: np.ndarray, latitudes: np.ndarray, rings: list[np.ndarray]) -> np.ndarray:
+    # Even-odd ray casting across every ring, so holes are handled without special cases
+    crossings = np.zeros(len(longitudes), dtype=np.int64)
+    longitudes = longitudes[:, np.newaxis]
+    latitudes = latitudes[:, np.newaxis]
+
+    for ring in rings:
+        for start in range(0, len(ring) - 1, EDGE_CHUNK_SIZE):
+            edges = ring[start:start + EDGE_CHUNK_SIZE + 1]
+            x_i, y_i = edges[:-1, 0], edges[:-1, 1]
+            x_j, y_j = edges[1:, 0], edges[1:, 1]
+
+            spans = (y_i > latitudes) != (y_j > latitudes)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                intersections = (x_j - x_i) * (latitudes - y_i) / (y_j - y_i) + x_i
+
+            crossings += (spans & (longitudes < intersections)).sum(axis=1)
+
+    return crossings % 2 == 1
+
+
+class BoundaryIndex:
+    cell_size: float
+    names: list[str]
+    polygons: list[list[np.ndarray]]
+    bounds: list[tuple[float, float, float, float]]
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.names = []
+        self.polygons = []
+        self.bounds = []
+        self.grid = collections.defaultdict(list)
+
+    def _cell(self, longitude: float, latitude: float) -> tuple[int, int]:
+        return math.floor(longitude / self.cell_size), math.floor(latitude / self.cell_size)
+
+    def add(self, name: str, rings: list[list[list[float]]]):
+        rings = [np.asarray(ring, dtype=float)[:, :2] for ring in rings if len(ring) > 2]
+        rings = [ring if np.array_equal(ring[0], ring[-1]) else np.vstack([ring, ring[:1]]) for ring in rings]
+
+        if len(rings) == 0:
+            return
+
+        coordinates = np.vstack(rings)
+        bounds = (coordinates[:, 0].min(), coordinates[:, 1].min(), coordinates[:, 0].max(), coordinates[:, 1].max())
+
+        index = len(self.polygons)
+        self.names.append(name)
+        self.polygons.append(rings)
+        self.bounds.append(bounds)
+
+        min_x, min_y = self._cell(bounds[0], bounds[1])
+        max_x, max_y = self._cell(bounds[2], bounds[3])
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                self.grid[(cell_x, cell_y)].append(index)
+
+    @staticmethod
+    def load_geojson(paths: list[str], name_property: str = "name", cell_size: float = DEFAULT_CELL_SIZE) -> "BoundaryIndex":
+        index = BoundaryIndex(cell_size)
+
+        for path in paths:
+            with open(path, "r", encoding="utf8") as geojson_file:
+                collection = json.load(geojson_file)
+
+            for feature in collection["features"]:
+                name = feature["properties"][name_property]
+                geometry = feature["geometry"]
+
+                if geometry["type"] == "Polygon":
+                    index.add(name, geometry["coordinates"])
+                elif geometry["type"] == "MultiPolygon":
+                    for polygon in geometry["coordinates"]:
+                        index.add(name, polygon)
+
+        return index
+
+    def classify(self, latitudes, longitudes) -> list[str]:
+        latitudes = np.asarray([np.nan if value is None else value for value in latitudes], dtype=float)
+        longitudes = np.asarray([np.nan if value is None else value for value in longitudes], dtype=float)
+
+        names = [None] * len(latitudes)
+        valid = np.flatnonzero(~(np.isnan(latitudes) | np.isnan(longitudes)))
+        if len(valid) == 0:
+            return names
+
+        # Points are bucketed by grid cell, each cell only tests the polygons whose bounds overlap it
+        cells = np.stack([np.floor(longitudes[valid] / self.cell_size), np.floor(latitudes[valid] / self.cell_size)], axis=1)
+        unique_cells, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        order = np.argsort(inverse, kind="stable")
+        groups = np.split(valid[order], np.cumsum(np.bincount(inverse))[:-1])
+
+        for cell, points in zip(unique_cells, groups):
+            for polygon_index in self.grid.get((int(cell[0]), int(cell[1])), []):
+                min_x, min_y, max_x, max_y = self.bounds[polygon_index]
+                point_longitudes, point_latitudes = longitudes[points], latitudes[points]
+
+                candidates = (point_longitudes >= min_x) & (point_longitudes <= max_x) & \
+                    (point_latitudes >= min_y) & (point_latitudes <= max_y)
+                if not candidates.any():
+                    continue
+
+                inside = np.zeros(len(points), dtype=bool)
+                inside[candidates] = point_in_rings(point_longitudes[candidates], point_latitudes[candidates],
+                                                    self.polygons[polygon_index])
+
+                for point in points[inside]:
+                    names[point] = self.names[polygon_index]
+
+                points = points[~inside]
+                if len(points) == 0:
+                    break
+
+        return names
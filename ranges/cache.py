@@ -0,0 +1,94 @@
+import hashlib
+import os
+import pickle
+
+# Bump whenever parsing changes what is produced for the same workbook, invalidating cached results
+PARSER_VERSION = 3
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_name: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as in_file:
+        for chunk in iter(lambda: in_file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class ParseCache:
+    directory: str
+    read: bool
+
+    def __init__(self, directory: str, read: bool = True):
+        self.directory = directory
+        self.read = read
+        self._content_hashes = {}
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_path(self, file_name: str, sheet_name: str) -> str:
+        # Every sheet is cached separately, the content hash still covers the whole workbook
+        key = os.path.abspath(file_name) if sheet_name is None else f"{os.path.abspath(file_name)}\0{sheet_name}"
+        path_hash = hashlib.sha256(key.encode("utf8")).hexdigest()
+        return os.path.join(self.directory, f"{path_hash}.pickle")
+
+    def _headers_path(self, file_name: str) -> str:
+        # Sheet names are never empty, so this key cannot collide with a sheet entry
+        path_hash = hashlib.sha256(f"{os.path.abspath(file_name)}\0".encode("utf8")).hexdigest()
+        return os.path.join(self.directory, f"{path_hash}.pickle")
+
+    def _content_hash(self, file_name: str) -> str:
+        if file_name not in self._content_hashes:
+            self._content_hashes[file_name] = hash_file(file_name)
+
+        return self._content_hashes[file_name]
+
+    def _read_entry(self, file_name: str, entry_path: str) -> dict:
+        if not self.read or not os.path.exists(entry_path):
+            return None
+
+        try:
+            with open(entry_path, "rb") as entry_file:
+                entry = pickle.load(entry_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, TypeError):
+            return None
+
+        if entry["parser_version"] != PARSER_VERSION or entry["content_hash"] != self._content_hash(file_name):
+            return None
+
+        return entry
+
+    def _write_entry(self, file_name: str, entry_path: str, **values):
+        entry = {
+            "parser_version": PARSER_VERSION,
+            "content_hash": self._content_hash(file_name),
+            **values,
+        }
+
+        with open(entry_path + ".tmp", "wb") as entry_file:
+            pickle.dump(entry, entry_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(entry_path + ".tmp", entry_path)
+
+    def load(self, file_name: str, sheet_name: str = None):
+        entry = self._read_entry(file_name, self._entry_path(file_name, sheet_name))
+        if entry is None:
+            return None
+
+        return entry["specimens"], entry["review_needed"]
+
+    def store(self, file_name: str, sheet_name: str, specimens, review_needed):
+        self._write_entry(file_name, self._entry_path(file_name, sheet_name), specimens=specimens, review_needed=review_needed)
+
+    def load_headers(self, file_name: str) -> dict[str, list[str]]:
+        # The sheet list of an unchanged workbook, so it is not opened just to find its sheets
+        entry = self._read_entry(file_name, self._headers_path(file_name))
+        if entry is None:
+            return None
+
+        return entry["headers"]
+
+    def store_headers(self, file_name: str, headers: dict[str, list[str]]):
+        self._write_entry(file_name, self._headers_path(file_name), headers=headers)
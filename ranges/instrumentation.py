@@ -0,0 +1,75 @@
+import collections
+import contextlib
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory is left out of the report there
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return None
+
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class RunReport:
+    stages: dict[str, dict]
+    counters: collections.Counter
+    files: dict[str, dict]
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = collections.Counter()
+        self.files = {}
+        self.started = time.perf_counter()
+
+    def add_time(self, name: str, seconds: float):
+        stage = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_rss_mb": None})
+        stage["seconds"] += seconds
+        stage["calls"] += 1
+        stage["peak_rss_mb"] = peak_rss_mb()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+
+    def merge(self, other: dict):
+        for name, stage in other["stages"].items():
+            merged = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_rss_mb": None})
+            merged["seconds"] += stage["seconds"]
+            merged["calls"] += stage["calls"]
+
+            peaks = [peak for peak in (merged["peak_rss_mb"], stage["peak_rss_mb"]) if peak is not None]
+            merged["peak_rss_mb"] = max(peaks) if len(peaks) > 0 else None
+
+        self.counters.update(other["counters"])
+
+    def to_dict(self) -> dict:
+        return {
+            "seconds": time.perf_counter() - self.started,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.stages,
+            "counters": dict(self.counters),
+            "files": self.files,
+        }
+
+    def write(self, path: str, **metadata):
+        with open(path, "w", encoding="utf8") as report_file:
+            json.dump({**metadata, **self.to_dict()}, report_file, indent=4)
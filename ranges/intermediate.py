@@ -0,0 +1,243 @@
+import os
+import shutil
+
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from ranges.arctos import melt_presence
+from ranges.specimen import DISTANCE_COLUMNS, WEIGHT_COLUMNS, CommonData, ReproductiveData, Specimen
+from ranges.units import DistanceUnit, WeightUnit
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # Optional, only needed to save or load intermediate tables
+    pa = None
+    pq = None
+
+SPECIMENS_FILE = "specimens.parquet"
+REVIEW_NEEDED_FILE = "review_needed.parquet"
+ARCTOS_FILE = "arctos_reference.parquet"
+
+# Rows converted to specimens at a time while loading
+LOAD_BATCH_SIZE = 10000
+
+INTEGER_COLUMNS = ["embryo_count", "embryo_count_left", "embryo_count_right"]
+TEXT_COLUMNS = ["scars", "repro_comments", "unformatted_measurements"]
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is needed to save or load intermediate tables, install it with 'pip install pyarrow'")
+
+
+def _measurement(specimen: Specimen, column_name: str):
+    if column_name in ("testes_length", "testes_width", "crown_rump_length"):
+        return getattr(specimen.reproductive_data, column_name)
+
+    return getattr(specimen.common_data, column_name)
+
+
+def specimen_schema():
+    require_pyarrow()
+
+    fields = [
+        pa.field("guid", pa.string()),
+        pa.field("sheet_name", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("collectors", pa.string()),
+        pa.field("collected_date", pa.string()),
+    ]
+
+    for column_name in DISTANCE_COLUMNS + WEIGHT_COLUMNS:
+        # Measurements keep their Decimal text, float cells can carry more digits than any fixed decimal scale
+        fields.append(pa.field(f"{column_name}_value", pa.string()))
+        fields.append(pa.field(f"{column_name}_unit", pa.dictionary(pa.int8(), pa.string())))
+        fields.append(pa.field(f"{column_name}_remarks", pa.string()))
+
+    for column_name in INTEGER_COLUMNS:
+        fields.append(pa.field(f"{column_name}_value", pa.int64()))
+        fields.append(pa.field(f"{column_name}_remarks", pa.string()))
+
+    for column_name in TEXT_COLUMNS:
+        fields.append(pa.field(column_name, pa.string()))
+
+    return pa.schema(fields)
+
+
+def specimens_to_table(specimens: list[Specimen]):
+    require_pyarrow()
+
+    columns = {
+        "guid": [specimen.guid for specimen in specimens],
+        "sheet_name": [specimen.sheet_name for specimen in specimens],
+        "collectors": [specimen.collectors for specimen in specimens],
+        "collected_date": [specimen.collected_date for specimen in specimens],
+    }
+
+    for column_name in DISTANCE_COLUMNS + WEIGHT_COLUMNS:
+        measurements = [_measurement(specimen, column_name) for specimen in specimens]
+        columns[f"{column_name}_value"] = [None if value is None else str(value) for value, _, _ in measurements]
+        columns[f"{column_name}_unit"] = [None if unit is None else unit.value for _, unit, _ in measurements]
+        columns[f"{column_name}_remarks"] = [remarks for _, _, remarks in measurements]
+
+    for column_name in INTEGER_COLUMNS:
+        values = [getattr(specimen.reproductive_data, column_name) for specimen in specimens]
+        columns[f"{column_name}_value"] = [value for value, _ in values]
+        columns[f"{column_name}_remarks"] = [remarks for _, remarks in values]
+
+    columns["scars"] = [specimen.reproductive_data.scars for specimen in specimens]
+    columns["repro_comments"] = [specimen.reproductive_data.repro_comments for specimen in specimens]
+    columns["unformatted_measurements"] = [specimen.common_data.unformatted_measurements for specimen in specimens]
+
+    return pa.Table.from_pydict(columns, schema=specimen_schema())
+
+
+def table_to_specimens(table) -> list[Specimen]:
+    # Takes a table or a single record batch
+    columns = table.to_pydict()
+
+    measurements = {}
+    for column_name in DISTANCE_COLUMNS + WEIGHT_COLUMNS:
+        unit_type = WeightUnit if column_name in WEIGHT_COLUMNS else DistanceUnit
+        measurements[column_name] = [
+            (None if value is None else Decimal(value),
+             None if unit is None else unit_type(unit),
+             remarks)
+            for value, unit, remarks in zip(columns[f"{column_name}_value"], columns[f"{column_name}_unit"],
+                                            columns[f"{column_name}_remarks"])]
+
+    integers = {column_name: list(zip(columns[f"{column_name}_value"], columns[f"{column_name}_remarks"]))
+                for column_name in INTEGER_COLUMNS}
+
+    specimens = []
+    for index, guid in enumerate(columns["guid"]):
+        specimens.append(Specimen(
+            guid = guid,
+            collectors = columns["collectors"][index],
+            collected_date = columns["collected_date"][index],
+            common_data = CommonData(
+                total_length = measurements["total_length"][index],
+                tail_length = measurements["tail_length"][index],
+                hind_foot_with_claw = measurements["hind_foot_with_claw"][index],
+                ear_from_notch = measurements["ear_from_notch"][index],
+                ear_from_crown = measurements["ear_from_crown"][index],
+                weight = measurements["weight"][index],
+                unformatted_measurements = columns["unformatted_measurements"][index]
+            ),
+            reproductive_data = ReproductiveData(
+                testes_length = measurements["testes_length"][index],
+                testes_width = measurements["testes_width"][index],
+                embryo_count = integers["embryo_count"][index],
+                embryo_count_left = integers["embryo_count_left"][index],
+                embryo_count_right = integers["embryo_count_right"][index],
+                crown_rump_length = measurements["crown_rump_length"][index],
+                scars = columns["scars"][index],
+                repro_comments = columns["repro_comments"][index]
+            ),
+            sheet_name = columns["sheet_name"][index]
+        ))
+
+    return specimens
+
+
+def save_specimens(directory: str, specimens: list[Specimen], review_needed: dict[str, list[tuple]]):
+    require_pyarrow()
+    os.makedirs(directory, exist_ok=True)
+
+    pq.write_table(specimens_to_table(specimens), os.path.join(directory, SPECIMENS_FILE))
+
+    reviews = [(file_name, *review) for file_name, file_reviews in review_needed.items() for review in file_reviews]
+    pq.write_table(pa.table({
+        "file_name": pa.array([review[0] for review in reviews], pa.string()).dictionary_encode(),
+        "guid": pa.array([review[1] for review in reviews], pa.string()),
+        "reason": pa.array([review[2] for review in reviews], pa.string()),
+        "sheet_name": pa.array([review[3] for review in reviews], pa.string()).dictionary_encode(),
+    }), os.path.join(directory, REVIEW_NEEDED_FILE))
+
+
+def load_specimens(directory: str) -> tuple[list[Specimen], dict[str, list[tuple]]]:
+    require_pyarrow()
+
+    # Converted a record batch at a time, only one batch of columns is held as Python lists
+    specimens = []
+    specimens_file = pq.ParquetFile(os.path.join(directory, SPECIMENS_FILE), memory_map=True)
+    for batch in specimens_file.iter_batches(batch_size=LOAD_BATCH_SIZE):
+        specimens.extend(table_to_specimens(batch))
+
+    review_needed = {}
+    reviews = pq.read_table(os.path.join(directory, REVIEW_NEEDED_FILE), memory_map=True).to_pydict()
+    for file_name, guid, reason, sheet_name in zip(reviews["file_name"], reviews["guid"], reviews["reason"], reviews["sheet_name"]):
+        review_needed.setdefault(file_name, []).append((guid, reason, sheet_name))
+
+    return specimens, review_needed
+
+
+def save_arctos_reference(directory: str, arctos_data):
+    require_pyarrow()
+    os.makedirs(directory, exist_ok=True)
+
+    rows = arctos_data.connection.execute("SELECT * FROM arctos_data").fetchall()
+    table = pa.table({column: pa.array([row[index] for row in rows], pa.string())
+                      for index, column in enumerate(arctos_data.columns)})
+    pq.write_table(table, os.path.join(directory, ARCTOS_FILE))
+
+
+def copy_arctos_reference(source_directory: str, directory: str):
+    # A reference loaded from Parquet is already in the saved layout, so the file is copied as is
+    os.makedirs(directory, exist_ok=True)
+
+    source = os.path.join(source_directory, ARCTOS_FILE)
+    destination = os.path.join(directory, ARCTOS_FILE)
+    if not os.path.exists(destination) or not os.path.samefile(source, destination):
+        shutil.copyfile(source, destination)
+
+
+class ArctosReference:
+    columns: list[str]
+
+    def __init__(self, table):
+        # The table stays in Arrow memory, only the requested rows and columns are ever converted
+        self.columns = table.column_names
+        self._column_set = set(self.columns)
+        self._table = table
+
+        # Later rows for a guid win, the same as the SQLite store
+        guids = table.column("guid").to_pandas()
+        latest = ~guids.duplicated(keep="last")
+        self._rows = pd.Series(np.flatnonzero(latest.to_numpy()), index=pd.Index(guids[latest]))
+
+    def _check_columns(self, columns):
+        for column in columns:
+            if column not in self._column_set:
+                raise KeyError(column)
+
+    def get(self, guid: str, columns: tuple[str]) -> tuple:
+        self._check_columns(columns)
+
+        index = self._rows.get(guid)
+        if index is None:
+            return None
+
+        return tuple(self._table.column(column)[index].as_py() for column in columns)
+
+    def presence(self, guids: list[str], columns: list[str]) -> pd.DataFrame:
+        self._check_columns(columns)
+
+        indices = self._rows.reindex(guids).dropna().to_numpy(dtype=np.int64)
+        frame = self._table.select(["guid", *columns]).take(pa.array(indices)).to_pandas()
+
+        return melt_presence(frame, columns)
+
+    def __contains__(self, guid: str) -> bool:
+        return guid in self._rows.index
+
+    def close(self):
+        pass
+
+
+def load_arctos_reference(directory: str) -> ArctosReference:
+    require_pyarrow()
+    return ArctosReference(pq.read_table(os.path.join(directory, ARCTOS_FILE), memory_map=True))
@@ -1,75 +1,350 @@
+import argparse
+import collections
 import csv
 import json
 import os
+import sqlite3
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
 
 import pandas as pd
 import numpy as np
 
-API_KEY = os.environ["GOOGLE_MAPS_API_KEY"]
+from ranges.boundaries import BoundaryIndex
+
+GOOGLE_GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+RAW_LOCATIONS_PATH = "raw_located_specimens.jsonl"
+
+# Bytes read per step when looking backwards for the last complete line
+TRIM_BLOCK_SIZE = 64 * 1024
+
+# Address component types kept from each geocode response, everything else is dropped on arrival
+LOCATION_TYPES = ("country", "administrative_area_level_1")
+
+# Coordinates are rounded before lookup and caching, 4 decimal places is roughly 11m
+COORDINATE_PRECISION = 4
+
+# Google reports quota and key problems with HTTP 200 and empty results, only these statuses describe the location
+ACCEPTED_STATUSES = ("OK", "ZERO_RESULTS")
+
+
+class GeocodeError(Exception):
+    pass
+
+
+class GoogleGeocoder:
+    base_url: str
+    api_key: str
+    retries: int
+    backoff: float
+
+    def __init__(self, api_key: str = None, base_url: str = GOOGLE_GEOCODE_URL, retries: int = 5, backoff: float = 1.0):
+        self.api_key = api_key if api_key is not None else os.environ["GOOGLE_MAPS_API_KEY"]
+        self.base_url = base_url
+        self.retries = retries
+        self.backoff = backoff
+
+    def fetch(self, session: requests.Session, latitude: float, longitude: float) -> dict:
+        for attempt in range(self.retries + 1):
+            response = session.get(self.base_url, params={"latlng": f"{latitude},{longitude}", "key": self.api_key})
+            response.raise_for_status()
+
+            body = response.json()
+            status = body.get("status")
+            if status in ACCEPTED_STATUSES:
+                return body
+
+            if status != "OVER_QUERY_LIMIT" or attempt == self.retries:
+                raise GeocodeError(f"Geocoding {latitude},{longitude} failed with status {status}", status, body.get("error_message"))
+
+            time.sleep(self.backoff * 2 ** attempt)
+
+
+class RateLimiter:
+    interval: float
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self._lock = threading.Lock()
+        self._next_request = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            scheduled = max(now, self._next_request)
+            self._next_request = scheduled + self.interval
+
+        if scheduled > now:
+            time.sleep(scheduled - now)
+
+
+def project_location(response: dict) -> dict[str, str]:
+    # Keeps the first long_name seen for each type, the same one a scan of the full response would find
+    location = dict.fromkeys(LOCATION_TYPES)
+
+    for result in response["results"]:
+        for component in result["address_components"]:
+            for location_type in component["types"]:
+                if location_type in location and location[location_type] is None:
+                    location[location_type] = component["long_name"]
+
+    return location
+
+
+class LocationCache:
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+
+        columns = ", ".join(f"{location_type} TEXT" for location_type in LOCATION_TYPES)
+        self._connection.execute(f"CREATE TABLE IF NOT EXISTS location_records (coordinates TEXT PRIMARY KEY, {columns})")
+
+    def get(self, key: str) -> dict[str, str]:
+        with self._lock:
+            row = self._connection.execute(f"SELECT {', '.join(LOCATION_TYPES)} FROM location_records WHERE coordinates = ?",
+                                           (key,)).fetchone()
+
+        return dict(zip(LOCATION_TYPES, row)) if row is not None else None
+
+    def put(self, key: str, location: dict[str, str]):
+        placeholders = ", ".join("?" for _ in range(len(LOCATION_TYPES) + 1))
+        with self._lock:
+            self._connection.execute(f"INSERT OR REPLACE INTO location_records VALUES ({placeholders})",
+                                     (key, *(location[location_type] for location_type in LOCATION_TYPES)))
+            self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+
+def round_coordinates(latitude: float, longitude: float, precision: int = COORDINATE_PRECISION) -> tuple[float, float]:
+    return round(float(latitude), precision), round(float(longitude), precision)
+
 
-CACHED_LOCATIONS = {}
+class ReverseGeocoder:
+    provider: GoogleGeocoder
+    cache: LocationCache
+    rate_limiter: RateLimiter
+    workers: int
+    precision: int
 
-def get_location_info(latitude: float, longitude: float) -> dict:
-    keyname = f"{latitude}_{longitude}"
+    def __init__(self, provider, cache: LocationCache = None, requests_per_second: float = 10, workers: int = 8,
+                 precision: int = COORDINATE_PRECISION):
+        self.provider = provider
+        self.cache = cache
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.workers = workers
+        self.precision = precision
 
-    if keyname not in CACHED_LOCATIONS:
-        response = requests.get(f"https://maps.googleapis.com/maps/api/geocode/json?latlng={latitude},{longitude}&key={API_KEY}")
-        CACHED_LOCATIONS[keyname] = response.json()
+        self._memory = {}
+        self._sessions = threading.local()
 
-    return CACHED_LOCATIONS[keyname]
+    def _session(self) -> requests.Session:
+        # One session per thread so each worker reuses its own pooled connection
+        if not hasattr(self._sessions, "session"):
+            self._sessions.session = requests.Session()
 
-def extract_location_of_type(location_info, location_type) -> str:
-    for location in location_info["results"]:
-        for component in location["address_components"]:
-            if location_type in component["types"]:
-                return component["long_name"]
+        return self._sessions.session
 
-    raise ValueError(f"Could not find {location_type} in location info", location_type, location_info)
+    def locate(self, latitude: float, longitude: float) -> dict[str, str]:
+        latitude, longitude = round_coordinates(latitude, longitude, self.precision)
+        key = f"{latitude:.{self.precision}f}_{longitude:.{self.precision}f}"
 
+        if key in self._memory:
+            return self._memory[key]
 
-def pull_raw_locations():
+        location = self.cache.get(key) if self.cache is not None else None
+        if location is None:
+            # fetch raises on quota and key errors, so only real answers are projected and cached
+            self.rate_limiter.wait()
+            location = project_location(self.provider.fetch(self._session(), latitude, longitude))
+
+            if self.cache is not None:
+                self.cache.put(key, location)
+
+        self._memory[key] = location
+        return location
+
+    def iter_located(self, coordinates: list[tuple[float, float]]):
+        # Yields (position, location_info) as lookups finish, nearby specimens share one rounded lookup
+        keys = [None if latitude is None or longitude is None else round_coordinates(latitude, longitude, self.precision)
+                for latitude, longitude in coordinates]
+
+        positions = collections.defaultdict(list)
+        for position, key in enumerate(keys):
+            if key is None:
+                yield position, None
+            else:
+                positions[key].append(position)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.locate, *key): key for key in positions}
+
+            for future in as_completed(futures):
+                location_info = future.result()
+                for position in positions[futures[future]]:
+                    yield position, location_info
+
+    def locate_all(self, coordinates: list[tuple[float, float]]) -> list[dict]:
+        location_infos = [None] * len(coordinates)
+        for position, location_info in self.iter_located(coordinates):
+            location_infos[position] = location_info
+
+        return location_infos
+
+
+_default_geocoder = None
+
+def get_location_info(latitude: float, longitude: float) -> dict[str, str]:
+    global _default_geocoder
+    if _default_geocoder is None:
+        _default_geocoder = ReverseGeocoder(GoogleGeocoder(), LocationCache("location_cache.sqlite"))
+
+    return _default_geocoder.locate(latitude, longitude)
+
+def extract_location_of_type(location_info: dict[str, str], location_type: str) -> str:
+    if location_info is None:
+        raise ValueError(f"No location info to find {location_type} in", location_type, location_info)
+
+    if location_info.get(location_type) is None:
+        raise ValueError(f"Could not find {location_type} in location info", location_type, location_info)
+
+    return location_info[location_type]
+
+
+def trim_partial_line(path: str, block_size: int = TRIM_BLOCK_SIZE):
+    # A crash can leave half a line at the end of the file, drop it so appends start on a clean line
+    with open(path, "rb+") as in_file:
+        end = in_file.seek(0, os.SEEK_END)
+
+        # Only the tail is read, backwards a block at a time until the last newline
+        position = end
+        while position > 0:
+            start = max(0, position - block_size)
+            in_file.seek(start)
+            block = in_file.read(position - start)
+
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+
+            position = start
+
+        if position < end:
+            in_file.truncate(position)
+
+
+def read_located_specimens(path: str = RAW_LOCATIONS_PATH):
+    with open(path, "r", encoding="utf8") as in_file:
+        for line in in_file:
+            if not line.endswith("\n"):
+                break
+
+            yield json.loads(line)
+
+
+def pull_raw_locations(geocoder: ReverseGeocoder, countries: BoundaryIndex = None, states: BoundaryIndex = None,
+                       path: str = RAW_LOCATIONS_PATH):
     specimens = pd.read_csv("misplaced_specimens.csv")
     specimens = specimens.replace({np.nan: None}).to_dict(orient="records")
 
-    results = []
+    # Resume after the last complete line of an earlier run
+    finished = set()
+    if os.path.exists(path):
+        trim_partial_line(path)
+        finished = set(specimen["guid"] for specimen in read_located_specimens(path))
+        print(f"Resuming, {len(finished)} specimens already located")
+
+    specimens = [specimen for specimen in specimens if specimen["guid"] not in finished]
+
+    # Local boundary files settle most specimens without a web request
+    latitudes = [specimen["dec_lat"] for specimen in specimens]
+    longitudes = [specimen["dec_long"] for specimen in specimens]
+    for field, boundaries in (("country", countries), ("state_prov", states)):
+        if boundaries is None:
+            continue
+
+        for specimen, name in zip(specimens, boundaries.classify(latitudes, longitudes)):
+            if specimen[field] is None:
+                specimen[field] = name
+
+    with open(path, "a", encoding="utf8") as out_file:
+        def write(specimen, location_info):
+            specimen["location_info"] = location_info
+            out_file.write(json.dumps(specimen) + "\n")
+            out_file.flush()
+
+        unresolved = []
+        for specimen in specimens:
+            if specimen["country"] is None or specimen["state_prov"] is None:
+                unresolved.append(specimen)
+            else:
+                write(specimen, None)
+
+        print(f"Locating {len(unresolved)} of {len(specimens)} specimens with the geocoder")
+
+        coordinates = [(specimen["dec_lat"], specimen["dec_long"]) for specimen in unresolved]
+        for position, location_info in geocoder.iter_located(coordinates):
+            write(unresolved[position], location_info)
+
+def process_raw_locations(path: str = RAW_LOCATIONS_PATH):
+    with open("./found_specimens.csv", "w", encoding="utf8", newline="") as out_file:
+        writer = None
+
+        for specimen in read_located_specimens(path):
+            if specimen["country"] is None:
+                try:
+                    specimen["country"] = extract_location_of_type(specimen["location_info"], "country")
+                except ValueError as err:
+                    print("No country found for guid", specimen["guid"])
 
-    for specimen in specimens:
-        print(specimen["guid"], specimen["dec_lat"], specimen["dec_long"])
-        specimen["location_info"] = get_location_info(specimen["dec_lat"], specimen["dec_long"])
-        results.append(specimen)
-        
-    with open("raw_located_specimens.json", "w", encoding="utf8") as out_file:
-        json.dump(results, out_file, indent=4)
+            if specimen["state_prov"] is None:
+                try:
+                    specimen["state_prov"] = extract_location_of_type(specimen["location_info"], "administrative_area_level_1")
+                except ValueError as err:
+                    print("No state_prov found for guid", specimen["guid"])
 
-def process_raw_locations():
-    with open("raw_located_specimens.json", "r", encoding="utf8") as in_file:
-        specimens = json.load(in_file)
-    
-    results = []
+            del specimen["location_info"]
 
-    for specimen in specimens:
-        if specimen["country"] is None:
-            try:
-                specimen["country"] = extract_location_of_type(specimen["location_info"], "country")
-            except ValueError as err:
-                print("No country found for guid", specimen["guid"])
+            if writer is None:
+                writer = csv.DictWriter(out_file, fieldnames=list(specimen.keys()), lineterminator=os.linesep)
+                writer.writeheader()
 
-        if specimen["state_prov"] is None:
-            try:
-                specimen["state_prov"] = extract_location_of_type(specimen["location_info"], "administrative_area_level_1")
-            except ValueError as err:
-                print("No state_prov found for guid", specimen["guid"])
+            writer.writerow(specimen)
 
-        del specimen["location_info"]
 
-        results.append(specimen)
+def main():
+    parser = argparse.ArgumentParser(description='Fills in country and state_prov for misplaced specimens')
+    parser.add_argument('step', choices=["pull", "process"], nargs="?", default="process")
+    parser.add_argument('--geocode_url', type=str, default=GOOGLE_GEOCODE_URL, help="Geocoding endpoint, point at a local stub server for testing")
+    parser.add_argument('--cache', type=str, default="location_cache.sqlite")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=10, help="Maximum geocoding requests per second")
+    parser.add_argument('--countries', type=str, nargs="*", default=[], help="GeoJSON country boundaries used before the geocoder")
+    parser.add_argument('--states', type=str, nargs="*", default=[], help="GeoJSON state/province boundaries used before the geocoder")
+    parser.add_argument('--name_property', type=str, default="name", help="Feature property holding the boundary name")
+    args = parser.parse_args()
 
-    csv_dataframe = pd.DataFrame.from_records(results)
-    csv_dataframe.to_csv(f"./found_specimens.csv", index=False)
-    
+    if args.step == "pull":
+        cache = LocationCache(args.cache)
+        geocoder = ReverseGeocoder(GoogleGeocoder(base_url=args.geocode_url), cache,
+                                   requests_per_second=args.rate, workers=args.workers)
+        countries = BoundaryIndex.load_geojson(args.countries, args.name_property) if args.countries else None
+        states = BoundaryIndex.load_geojson(args.states, args.name_property) if args.states else None
+        pull_raw_locations(geocoder, countries, states)
+        cache.close()
+    else:
+        process_raw_locations()
 
 
 if __name__ == "__main__":
-    process_raw_locations()
+    main()
@@ -1,15 +1,23 @@
 import sqlparse
 
-attributes = ["total length", "tail length", "hind foot with claw", "ear from notch", "ear from crown", "weight", "reproductive data", "unformatted measurements"]
+from ranges.query_builder import in_condition, load_attributes, pivot_query, render_query
+
+attributes = load_attributes("config.json")
 guid_prefix = "MVZ:Mamm"
 species = "Peromyscus maniculatus"
 
-fields = ["flat.guid", "flat.subspecies", "CAST(flat.cat_num as INTEGER) as catalognumberint", "flat.collectors", "state_prov", "county", "flat.spec_locality", "collectornumber","verbatim_date", "parts", "sex"]
-fields.extend([f"a{key}.attribute_value as \"{value}\"" for key, value in enumerate(attributes)])
+fields = ["flat.guid", "flat.subspecies", ("CAST(flat.cat_num as INTEGER)", "catalognumberint"), "flat.collectors", "state_prov", "county", "flat.spec_locality", "collectornumber","verbatim_date", "parts", "sex"]
+
+countries = ['United States','Mexico','Canada', 'NULL']
+states = ['Alaska','Alberta','Arizona','Arkansas','British Columbia','California','Colorado','Idaho','Illinois','Kansas','Mexico','Michigan','Montana','Nebraska','New Mexico','North Dakota','Nevada','Oregon', 'Oklahoma','Saskatchewan','South Dakota','Texas','Utah','Washington','Wyoming', 'Yukon', 'Northwest Territories', 'Aguascalientes', 'Baja California','Baja California Sur','Campeche', 'Chiapas','Chihuahua','Coahuila','Colima', 'Durango', 'Guanajuato', 'Guerrero','Hidalgo','Jalisco','Mexico','Mexico City','Michoacan','Morelos','Nayarit','Nuevo Leon','Oaxaca','Puebla','Queretaro', 'Quintana Roo','Sinaloa','Sonora','San Luis Potosi', 'Tamaulipas','Tlaxcala', 'Veracruz','Yucatan','Zacatecas']
 
-tables = ["flat"]
-tables.extend([f"LEFT OUTER JOIN (SELECT * FROM attributes WHERE attribute_type = '{value}') as a{key} ON flat.collection_object_id = a{key}.collection_object_id" for key, value in enumerate(attributes)])
+conditions = [
+    ("guid_prefix LIKE ?", [guid_prefix]),
+    ("species LIKE ?", [species]),
+    in_condition("country", countries),
+    in_condition("state_prov", states),
+]
 
-query = "SELECT * FROM (SELECT " + ", ".join(fields) + " FROM " + " ".join(tables) + " WHERE guid_prefix LIKE '" + guid_prefix + "' AND species LIKE '" + species + "' AND country in ('United States','Mexico','Canada', 'NULL') AND state_prov in ('Alaska','Alberta','Arizona','Arkansas','British Columbia','California','Colorado','Idaho','Illinois','Kansas','Mexico','Michigan','Montana','Nebraska','New Mexico','North Dakota','Nevada','Oregon', 'Oklahoma','Saskatchewan','South Dakota','Texas','Utah','Washington','Wyoming', 'Yukon', 'Northwest Territories', 'Aguascalientes', 'Baja California','Baja California Sur','Campeche', 'Chiapas','Chihuahua','Coahuila','Colima', 'Durango', 'Guanajuato', 'Guerrero','Hidalgo','Jalisco','Mexico','Mexico City','Michoacan','Morelos','Nayarit','Nuevo Leon','Oaxaca','Puebla','Queretaro', 'Quintana Roo','Sinaloa','Sonora','San Luis Potosi', 'Tamaulipas','Tlaxcala', 'Veracruz','Yucatan','Zacatecas')) as specimen_data"
+query, params = pivot_query(attributes, fields, conditions, order_by=None)
 
-print(sqlparse.format(query, reindent=True, keyword_case='upper'))
+print(sqlparse.format(render_query(query, params), reindent=True, keyword_case='upper'))
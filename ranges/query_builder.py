@@ -0,0 +1,98 @@
+import json
+
+from ranges.arctos import quote_identifier
+
+# Guids per generated query, keeps each IN-list well under common database limits
+GUID_BATCH_SIZE = 1000
+
+# Columns the accession pipeline reads from the Arctos pull
+ARCTOS_FIELDS = ["flat.collection_object_id", "flat.guid", "flat.ended_date", "flat.collectors"]
+
+
+def load_attributes(config_path: str = "config.json") -> list[str]:
+    with open(config_path, "r", encoding="utf8") as config_file:
+        return json.load(config_file)["attributes"]
+
+
+def in_condition(column: str, values: list) -> tuple[str, list]:
+    return f"{column} IN ({', '.join('?' * len(values))})", list(values)
+
+
+def pivot_query(attributes: list[str], fields: list = ARCTOS_FIELDS, conditions: list[tuple[str, list]] = (),
+                order_by: str = "flat.guid") -> tuple[str, list]:
+    # Fields are plain expressions or (expression, alias) pairs, conditions are (sql, params) pairs joined with AND
+    fields = [field if isinstance(field, tuple) else (field, None) for field in fields]
+    select = [expression if alias is None else f"{expression} AS {alias}" for expression, alias in fields]
+    params = []
+
+    # One pass over attributes pivots every type into its own column instead of a self-join per type
+    for attribute in attributes:
+        select.append(f"MAX(CASE WHEN attributes.attribute_type = ? THEN attributes.attribute_value END) AS {quote_identifier(attribute)}")
+        params.append(attribute)
+
+    attribute_filter, attribute_params = in_condition("attributes.attribute_type", attributes)
+    params.extend(attribute_params)
+
+    lines = [
+        "SELECT " + ",\n    ".join(select),
+        "FROM flat",
+        f"LEFT OUTER JOIN attributes ON flat.collection_object_id = attributes.collection_object_id AND {attribute_filter}",
+    ]
+
+    if len(conditions) > 0:
+        lines.append("WHERE " + "\n  AND ".join(condition for condition, _ in conditions))
+        for _, condition_params in conditions:
+            params.extend(condition_params)
+
+    lines.append("GROUP BY " + ", ".join(expression for expression, _ in fields))
+    if order_by is not None:
+        lines.append(f"ORDER BY {order_by}")
+
+    return "\n".join(lines), params
+
+
+def guid_batches(guids, batch_size: int = GUID_BATCH_SIZE) -> list[list[str]]:
+    guids = sorted(set(guids))
+    return [guids[start:start + batch_size] for start in range(0, len(guids), batch_size)]
+
+
+def batched_queries(attributes: list[str], guids, batch_size: int = GUID_BATCH_SIZE, fields: list = ARCTOS_FIELDS,
+                    conditions: list[tuple[str, list]] = ()):
+    for batch in guid_batches(guids, batch_size):
+        yield pivot_query(attributes, fields, [*conditions, in_condition("flat.guid", batch)])
+
+
+def render_literal(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def render_query(sql: str, params: list) -> str:
+    # Substitutes placeholders for pasting into a web query form, quoted text is left untouched
+    params = iter(params)
+    rendered = []
+    quote = None
+
+    for character in sql:
+        if quote is not None:
+            if character == quote:
+                quote = None
+        elif character in ("'", '"'):
+            quote = character
+        elif character == "?":
+            rendered.append(render_literal(next(params)))
+            continue
+
+        rendered.append(character)
+
+    return "".join(rendered)
+
+
+def write_queries(path: str, queries):
+    with open(path, "w", encoding="utf8") as query_file:
+        for sql, params in queries:
+            query_file.write(render_query(sql, params) + ";\n\n")
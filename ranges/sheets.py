@@ -1,5 +1,7 @@
 
+import functools
 import math
+import operator
 import re
 
 from decimal import Decimal, InvalidOperation
@@ -7,6 +9,15 @@ from typing import Union
 
 from ranges.units import DistanceUnit, WeightUnit
 
+GUID_PATTERN = re.compile(r"^(?:MVZ)?:?(?:Mamm)?:?([0-9]+)$")
+FRACTION_PATTERN = re.compile(r"(?:([0-9]+) )?([0-9]+)/([1-9][0-9]*)")
+
+NOT_RECORDED_VALUES = {"", "not recorded", "?", "no recorded", "already in arctos",
+                       "no measurements", "not recoded", "no data"}
+
+# Upper bound on memoized measurement strings, real sheets repeat a small set of values
+PARSE_CACHE_SIZE = 16384
+
 class SheetParser:
     expected_columns = [
     {
@@ -154,8 +165,7 @@ class SheetParser:
         if isinstance(raw_value, str):
             value_cleaned = raw_value.strip().lower()
 
-            if value_cleaned in ["", "not recorded", "?", "no recorded", "already in arctos",
-                                "no measurements", "not recoded", "no data"]:
+            if value_cleaned in NOT_RECORDED_VALUES:
                 return False
         
         return True
@@ -164,7 +174,7 @@ class SheetParser:
         if value is None:
             raise ValueError("Cannot parse guid from None value")
 
-        matched = re.match(r"^(?:MVZ)?:?(?:Mamm)?:?([0-9]+)$", value)
+        matched = GUID_PATTERN.match(value)
 
         if matched is None:
             raise ValueError("Couldn't parse guid from value", f"'{value}'")
@@ -185,44 +195,41 @@ class SheetParser:
 
         return missing_columns
 
-    def extract_record(raw_record):
-        record = {}
+    def compile_header(columns) -> "HeaderPlan":
+        positions = {}
+        for index, column in enumerate(columns):
+            positions.setdefault(column, index)
 
-        found_columns = set()
+        column_names = []
+        source_names = []
+        indices = []
         for expected_column in SheetParser.expected_columns:
-            found = False
+            index = None
             for valid_name in expected_column["valid_names"]:
-                if valid_name in raw_record:
-                    column = raw_record[valid_name]
-                    if isinstance(column, str):
-                        column = column.strip()
-                    
-                    if SheetParser.is_recorded(column):
-                        record[expected_column["column_name"]] = str(column)
-                    else:
-                        record[expected_column["column_name"]] = None
-
-                    found = True
+                if valid_name in positions:
+                    index = positions[valid_name]
+                    source_names.append(valid_name)
                     break
-            
-            if not found:
-                if expected_column["optional"]:
-                    record[expected_column["column_name"]] = None
-                else:
-                    raise ValueError("Could not find field", expected_column["column_name"], raw_record)
+
+            if index is None:
+                if not expected_column["optional"]:
+                    raise ValueError("Could not find field", expected_column["column_name"], list(columns))
             else:
-                found_columns.add(expected_column["column_name"])
-        
-        if record["ear_from_notch"] is None:
-            record["ear_from_notch"] = record["ear"]
+                column_names.append(expected_column["column_name"])
+                indices.append(index)
 
-        if record["ear"] is not None and record["ear_from_notch"] != record["ear"]:
-            raise ValueError("Ear and Notch column mismatched", record["ear"], record["ear_from_notch"], raw_record)
-        
-        if "ear" not in found_columns and "ear_from_notch" not in found_columns and "ear_from_crown" not in found_columns:
-            raise ValueError("Could not find any column for ear measurements", raw_record)
-            
-        return record
+        if "ear" not in column_names and "ear_from_notch" not in column_names and "ear_from_crown" not in column_names:
+            raise ValueError("Could not find any column for ear measurements", list(columns))
+
+        return HeaderPlan(column_names, source_names, indices)
+
+    @functools.lru_cache(maxsize=64)
+    def _cached_header(columns: tuple) -> "HeaderPlan":
+        return SheetParser.compile_header(columns)
+
+    def extract_record(raw_record):
+        plan = SheetParser._cached_header(tuple(raw_record.keys()))
+        return plan.extract(tuple(raw_record.values()))
 
     
     def parse_numerical_attribute(raw_value: str,
@@ -240,7 +247,19 @@ class SheetParser:
             raise ValueError("Invalid default value type")
             
 
-        matched = re.match("(?:([0-9]+) )?([0-9]+)/([1-9][0-9]*)", value_cleaned)
+        value, remarks = SheetParser.parse_decimal_text(value_cleaned, raw_value)
+
+        if extracted_unit is not None and unit is not None and extracted_unit != unit:
+            print("Unit Mismatched")
+
+        if extracted_unit is None:
+            extracted_unit = unit or default
+
+        return value, extracted_unit, remarks
+    
+    @functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+    def parse_decimal_text(value_cleaned: str, raw_value: str) -> tuple[Decimal, str]:
+        matched = FRACTION_PATTERN.match(value_cleaned)
 
         value = None
         remarks = None
@@ -254,14 +273,8 @@ class SheetParser:
         except InvalidOperation:
             remarks = raw_value
 
-        if extracted_unit is not None and unit is not None and extracted_unit != unit:
-            print("Unit Mismatched")
+        return value, remarks
 
-        if extracted_unit is None:
-            extracted_unit = unit or default
-
-        return value, extracted_unit, remarks
-    
     def parse_integer_attribute(raw_value: str) -> tuple[int, str]:
         if raw_value is None:
             return None, None
@@ -273,4 +286,41 @@ class SheetParser:
         except ValueError:
             remarks = raw_value
 
-        return value, remarks
\ No newline at end of file
+        return value, remarks
+
+
+class HeaderPlan:
+    column_names: list[str]
+    source_names: list[str]
+    indices: list[int]
+
+    def __init__(self, column_names, source_names, indices):
+        self.column_names = column_names
+        self.source_names = source_names
+        self.indices = indices
+
+        self.empty_record = dict.fromkeys(column["column_name"] for column in SheetParser.expected_columns)
+        self.check_ear = "ear" in column_names
+
+        if len(indices) == 1:
+            self.project = lambda row: (row[indices[0]],)
+        else:
+            self.project = operator.itemgetter(*indices)
+
+    def extract(self, row):
+        record = self.empty_record.copy()
+
+        for column_name, value in zip(self.column_names, self.project(row)):
+            if isinstance(value, str):
+                value = value.strip()
+
+            if SheetParser.is_recorded(value):
+                record[column_name] = str(value)
+
+        if record["ear_from_notch"] is None:
+            record["ear_from_notch"] = record["ear"]
+
+        if self.check_ear and record["ear"] is not None and record["ear_from_notch"] != record["ear"]:
+            raise ValueError("Ear and Notch column mismatched", record["ear"], record["ear_from_notch"], row)
+
+        return record
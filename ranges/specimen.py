@@ -3,10 +3,18 @@ import pandas as pd
 
 from decimal import Decimal
 
+from ranges.attributes import AttributeColumns, NUMERICAL_COLUMNS, TEXT_COLUMNS
 from ranges.units import DistanceUnit, WeightUnit
 from ranges.sheets import SheetParser
 
+DISTANCE_COLUMNS = ["total_length", "tail_length", "hind_foot_with_claw", "ear_from_notch", "ear_from_crown",
+                    "testes_length", "testes_width", "crown_rump_length"]
+WEIGHT_COLUMNS = ["weight"]
+
 class CommonData:
+    __slots__ = ("total_length", "tail_length", "hind_foot_with_claw", "ear_from_notch", "ear_from_crown",
+                 "weight", "unformatted_measurements")
+
     total_length: tuple[Decimal, DistanceUnit, str]
     tail_length: tuple[Decimal, DistanceUnit, str]
     hind_foot_with_claw: tuple[Decimal, DistanceUnit, str]
@@ -34,6 +42,9 @@ class CommonData:
         
 
 class ReproductiveData:
+    __slots__ = ("testes_length", "testes_width", "embryo_count", "embryo_count_left", "embryo_count_right",
+                 "crown_rump_length", "scars", "repro_comments")
+
     testes_length: tuple[Decimal, DistanceUnit, str]
     testes_width: tuple[Decimal, DistanceUnit, str]
     embryo_count: tuple[int, str]
@@ -63,61 +74,102 @@ class ReproductiveData:
 
 
 class Specimen:
+    __slots__ = ("guid", "collectors", "collected_date", "common_data", "reproductive_data", "sheet_name")
+
     guid: str
     collectors: str
     collected_date: str
+    sheet_name: str
 
     common_data: CommonData
     reproductive_data: ReproductiveData
 
 
-    def __init__(self, guid, collectors, collected_date, common_data, reproductive_data):
+    def __init__(self, guid, collectors, collected_date, common_data, reproductive_data, sheet_name=None):
         self.guid = guid
         self.collectors = collectors
         self.collected_date = collected_date
+        self.sheet_name = sheet_name
 
         self.common_data = common_data
         self.reproductive_data = reproductive_data
     
     def from_raw_record(raw_record):
-        record = SheetParser.extract_record(raw_record)
-
-        guid = SheetParser.parse_mvz_guid(record["mvz_num"])
-        distance_unit = DistanceUnit.from_string(record["distance_unit"])
-        weight_unit = WeightUnit.from_string(record["weight_unit"])
-
-        if record["review_needed"] is not None:
-            raise ReviewNeededException(guid, record["review_needed"])
-
-        return Specimen(
-            guid = guid,
-            collectors = record["collector"],
-            collected_date = record["date"],
-            common_data = CommonData(
-                total_length = SheetParser.parse_numerical_attribute(record["total_length"], distance_unit, DistanceUnit.MILLIMETERS),
-                tail_length = SheetParser.parse_numerical_attribute(record["tail_length"], distance_unit, DistanceUnit.MILLIMETERS),
-                hind_foot_with_claw = SheetParser.parse_numerical_attribute(record["hind_foot_with_claw"], distance_unit, DistanceUnit.MILLIMETERS),
-                ear_from_notch = SheetParser.parse_numerical_attribute(record["ear_from_notch"], distance_unit, DistanceUnit.MILLIMETERS),
-                ear_from_crown = SheetParser.parse_numerical_attribute(record["ear_from_crown"], distance_unit, DistanceUnit.MILLIMETERS),
-                weight = SheetParser.parse_numerical_attribute(record["weight"], weight_unit, WeightUnit.GRAMS),
-                unformatted_measurements = record["unformatted_measurements"]
-            ),
-            reproductive_data = ReproductiveData(
-                testes_length = SheetParser.parse_numerical_attribute(record["testes_length"], distance_unit, DistanceUnit.MILLIMETERS),
-                testes_width = SheetParser.parse_numerical_attribute(record["testes_width"], distance_unit, DistanceUnit.MILLIMETERS),
-                embryo_count = SheetParser.parse_integer_attribute(record["embryo_count"]),
-                embryo_count_left = SheetParser.parse_integer_attribute(record["embryo_count_left"]),
-                embryo_count_right = SheetParser.parse_integer_attribute(record["embryo_count_right"]),
-                crown_rump_length = SheetParser.parse_numerical_attribute(record["crown_rump_length"], distance_unit, DistanceUnit.MILLIMETERS),
-                scars = record["scars"],
-                repro_comments = record["repro_comments"]
-            )
-        )
+        return Specimen.from_record(SheetParser.extract_record(raw_record))
+
+    def from_record(record):
+        specimens, review_needed = Specimen.from_records([record])
+
+        if len(review_needed) > 0:
+            raise ReviewNeededException(*review_needed[0])
+
+        return specimens[0]
+
+    def from_records(records: list[dict]) -> tuple[list["Specimen"], list[tuple[str, str]]]:
+        review_needed = []
+        accepted = []
+        distance_units = []
+        weight_units = []
+        for record in records:
+            guid = SheetParser.parse_mvz_guid(record["mvz_num"])
+            distance_unit = DistanceUnit.from_string(record["distance_unit"])
+            weight_unit = WeightUnit.from_string(record["weight_unit"])
+
+            if record["review_needed"] is not None:
+                review_needed.append((guid, record["review_needed"]))
+            else:
+                accepted.append((guid, record))
+                distance_units.append(distance_unit)
+                weight_units.append(weight_unit)
+
+        # Measurements are parsed a column at a time across the whole batch, repeated cells hit the parse cache
+        parsed = {}
+        for column_name in DISTANCE_COLUMNS:
+            parsed[column_name] = [SheetParser.parse_numerical_attribute(record[column_name], unit, DistanceUnit.MILLIMETERS)
+                                   for (_, record), unit in zip(accepted, distance_units)]
+        for column_name in WEIGHT_COLUMNS:
+            parsed[column_name] = [SheetParser.parse_numerical_attribute(record[column_name], unit, WeightUnit.GRAMS)
+                                   for (_, record), unit in zip(accepted, weight_units)]
+
+        specimens = []
+        for index, (guid, record) in enumerate(accepted):
+            specimens.append(Specimen(
+                guid = guid,
+                collectors = record["collector"],
+                collected_date = record["date"],
+                common_data = CommonData(
+                    total_length = parsed["total_length"][index],
+                    tail_length = parsed["tail_length"][index],
+                    hind_foot_with_claw = parsed["hind_foot_with_claw"][index],
+                    ear_from_notch = parsed["ear_from_notch"][index],
+                    ear_from_crown = parsed["ear_from_crown"][index],
+                    weight = parsed["weight"][index],
+                    unformatted_measurements = record["unformatted_measurements"]
+                ),
+                reproductive_data = ReproductiveData(
+                    testes_length = parsed["testes_length"][index],
+                    testes_width = parsed["testes_width"][index],
+                    embryo_count = SheetParser.parse_integer_attribute(record["embryo_count"]),
+                    embryo_count_left = SheetParser.parse_integer_attribute(record["embryo_count_left"]),
+                    embryo_count_right = SheetParser.parse_integer_attribute(record["embryo_count_right"]),
+                    crown_rump_length = parsed["crown_rump_length"][index],
+                    scars = record["scars"],
+                    repro_comments = record["repro_comments"]
+                )
+            ))
+
+        return specimens, review_needed
             
 
     def export_attributes(self) -> list:
-        attributes = []
-        unitless_attributes = []
+        attributes = AttributeColumns(NUMERICAL_COLUMNS)
+        unitless_attributes = AttributeColumns(TEXT_COLUMNS)
+
+        self.export_attributes_to(attributes, unitless_attributes)
+
+        return attributes.to_records(), unitless_attributes.to_records()
+
+    def export_attributes_to(self, attributes: AttributeColumns, unitless_attributes: AttributeColumns):
         unparsed_values = []
 
         for value, attribute_type in [(self.common_data.total_length, "total length"),
@@ -128,15 +180,8 @@ class Specimen:
                                       (self.common_data.weight, "weight"),
                                       (self.reproductive_data.crown_rump_length, "crown-rump length")]:
             if value[0] is not None:
-                attributes.append({
-                    "guid": self.guid,
-                    "attribute_type": attribute_type,
-                    "attribute_value": str(value[0]),
-                    "attribute_units": value[1].value,
-                    "attribute_date": self.collected_date,
-                    "attribute_remark": value[2],
-                    "attribute_determiner": self.collectors,
-                })
+                attributes.append(self.guid, attribute_type, str(value[0]), value[1].value,
+                                  self.collected_date, value[2], self.collectors)
 
             elif value[2] is not None:
                 unparsed_values.append(f"\"{attribute_type}\": \"{value[2]}\"")
@@ -145,24 +190,12 @@ class Specimen:
             unparsed_values.append(self.common_data.unformatted_measurements)
 
         if len(unparsed_values) > 0:
-            unitless_attributes.append({
-                "guid": self.guid,
-                "attribute_type": "unformatted measurements",
-                "attribute_value": ", ".join(unparsed_values),
-                "attribute_date": self.collected_date,
-                "attribute_determiner": self.collectors,
-            })
+            unitless_attributes.append(self.guid, "unformatted measurements", ", ".join(unparsed_values),
+                                       self.collected_date, self.collectors)
 
         if self.reproductive_data.repro_comments is not None:
-            unitless_attributes.append({
-                "guid": self.guid,
-                "attribute_type": "reproductive data",
-                "attribute_value": self.reproductive_data.repro_comments,
-                "attribute_date": self.collected_date,
-                "attribute_determiner": self.collectors,
-            })
-
-        return attributes, unitless_attributes
+            unitless_attributes.append(self.guid, "reproductive data", self.reproductive_data.repro_comments,
+                                       self.collected_date, self.collectors)
 
 
 class ReviewNeededException(Exception):
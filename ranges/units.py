@@ -1,35 +1,33 @@
-
 import enum
+import functools
 import re
 
+WEIGHT_SPLIT_PATTERN = re.compile(r"^(.+?[0-9|\s])\s*(g|grams|oz|ounces)$")
+DISTANCE_SPLIT_PATTERN = re.compile(r"^(.+?[0-9|\s])\s*(mm|in|in\.|inches)$")
+
+# Sheets repeat a small set of cell strings, so split results are memoized
+SPLIT_CACHE_SIZE = 4096
+
 class WeightUnit(enum.Enum):
     GRAMS = "g"
     OUNCES = "oz"
 
     def from_string(value: str):
-        if value in ["g", "grams"]:
-            return WeightUnit.GRAMS
-        elif value in ["oz", "ounces"]:
-            return WeightUnit.OUNCES
-        elif value is None:
+        if value is None:
             return None
-        else:
+
+        unit = WEIGHT_UNIT_ALIASES.get(value) if isinstance(value, str) else None
+        if unit is None:
             raise ValueError("Could not parse weight unit from value", value)
-        
+
+        return unit
+
     @staticmethod
     def split_value(value: str):
         if value is None:
             raise ValueError("Cannot split None value")
 
-        matched = re.match(r"^(.+?[0-9|\s])\s*(g|grams|oz|ounces)$", value.strip())
-
-        if matched is None:
-            return value.strip(), None
-        
-        value_cleaned = matched.group(1).strip()
-        extracted_unit = matched.group(2).strip()
-
-        return value_cleaned, WeightUnit.from_string(extracted_unit) if extracted_unit is not None else None
+        return _split_weight(value)
 
 class DistanceUnit(enum.Enum):
     INCHES = "in"
@@ -38,28 +36,55 @@ class DistanceUnit(enum.Enum):
 
     @staticmethod
     def from_string(value: str):
-        if value == "in" or value == "in." or value == "inches" or value == "inch":
-            return DistanceUnit.INCHES
-        elif value == "mm":
-            return DistanceUnit.MILLIMETERS
-        elif value == "cm":
-            return DistanceUnit.CENTIMETERS
-        elif value is None:
+        if value is None:
             return None
-        else:
+
+        unit = DISTANCE_UNIT_ALIASES.get(value) if isinstance(value, str) else None
+        if unit is None:
             raise ValueError("Could not parse distance unit from value", value)
-        
+
+        return unit
+
     @staticmethod
     def split_value(value: str):
         if value is None:
             raise ValueError("Cannot split None value")
-        
-        matched = re.match(r"^(.+?[0-9|\s])\s*(mm|in|in\.|inches)$", value.strip())
 
-        if matched is None:
-            return value.strip(), None
-        
-        value_cleaned = matched.group(1).strip()
-        extracted_unit = matched.group(2).strip()
+        return _split_distance(value)
+
+
+WEIGHT_UNIT_ALIASES = {
+    "g": WeightUnit.GRAMS,
+    "grams": WeightUnit.GRAMS,
+    "oz": WeightUnit.OUNCES,
+    "ounces": WeightUnit.OUNCES,
+}
+
+DISTANCE_UNIT_ALIASES = {
+    "in": DistanceUnit.INCHES,
+    "in.": DistanceUnit.INCHES,
+    "inches": DistanceUnit.INCHES,
+    "inch": DistanceUnit.INCHES,
+    "mm": DistanceUnit.MILLIMETERS,
+    "cm": DistanceUnit.CENTIMETERS,
+}
+
+
+def _split(pattern: re.Pattern, unit_type, value: str):
+    matched = pattern.match(value.strip())
+
+    if matched is None:
+        return value.strip(), None
+
+    value_cleaned = matched.group(1).strip()
+    extracted_unit = matched.group(2).strip()
+
+    return value_cleaned, unit_type.from_string(extracted_unit) if extracted_unit is not None else None
+
+@functools.lru_cache(maxsize=SPLIT_CACHE_SIZE)
+def _split_weight(value: str):
+    return _split(WEIGHT_SPLIT_PATTERN, WeightUnit, value)
 
-        return value_cleaned, DistanceUnit.from_string(extracted_unit) if extracted_unit is not None else None
\ No newline at end of file
+@functools.lru_cache(maxsize=SPLIT_CACHE_SIZE)
+def _split_distance(value: str):
+    return _split(DISTANCE_SPLIT_PATTERN, DistanceUnit, value)
@@ -1,326 +1,248 @@
-import sqlite3
+import argparse
+import collections
+import functools
 import glob
-import pandas as pd
-import datetime
-import math
-import re
-
-from dateutil.parser import parse
-
-expected_columns = [
-    {
-        "column_name": "MVZ #",
-        "valid_names": ["MVZ #", "MVZ#", "catalognumberint"],
-        "type": "whole",
-        "optional": False
-    },
-    {
-        "column_name": "total",
-        "valid_names": ["total"],
-        "type": "decimal",
-        "optional": False
-    },
-    {
-        "column_name": "tail",
-        "valid_names": ["tail"],
-        "type": "decimal",
-        "optional": False
-    },
-    {
-        "column_name": "hf",
-        "valid_names": ["hf"],
-        "type": "decimal",
-        "optional": False
-    },
-    {
-        "column_name": "ear",
-        "valid_names": ["ear"],
-        "type": "decimal",
-        "optional": False
-    },
-    {
-        "column_name": "Notch",
-        "valid_names": ["Notch"],
-        "type": "decimal",
-        "optional": False
-    },
-    {
-        "column_name": "Crown",
-        "valid_names": ["Crown"],
-        "type": "decimal",
-        "optional": False
-    },
-    {
-        "column_name": "unit",
-        "valid_names": ["unit"],
-        "type": "distance_unit",
-        "optional": False
-    },
-    {
-        "column_name": "wt",
-        "valid_names": ["wt"],
-        "type": "decimal",
-        "optional": False
-    },
-    {
-        "column_name": "units",
-        "valid_names": ["units"],
-        "type": "mass_unit",
-        "optional": False
-    },
-    {
-        "column_name": "repro comments",
-        "valid_names": ["units"],
-        "type": "text",
-        "optional": False
-    },
-    {
-        "column_name": "testes L",
-        "valid_names": ["testes L", "testis L"],
-        "type": "decimal",
-        "optional": False
-    },
-    {
-        "column_name": "testes W",
-        "valid_names": ["testes W", "testes R", "testis W", "testis R"],
-        "type": "decimal",
-        "optional": False
-    },
-    {
-        "column_name": "emb count",
-        "valid_names": ["emb count"],
-        "type": "whole",
-        "optional": True
-    },
-    {
-        "column_name": "embs L",
-        "valid_names": ["embs L"],
-        "type": "whole",
-        "optional": False
-    },
-    {
-        "column_name": "embs R",
-        "valid_names": ["embs R"],
-        "type": "whole",
-        "optional": False
-    },
-    {
-        "column_name": "emb CR",
-        "valid_names": ["emb CR"],
-        "type": "decimal",
-        "optional": True
-    },
-    {
-        "column_name": "scars",
-        "valid_names": ["scars"],
-        "type": "text",
-        "optional": True
-    }]
-
-def is_none(value):
-    if value is None:
-        return True
-
-    if isinstance(value, float) and math.isnan(value):
-        return True
-
-    if isinstance(value, str):
-        value_cleaned = value.strip().lower()
-
-        if value_cleaned in ["", "not recorded", "?"]:
-            return True
-    
-    return False
-
-def is_valid_whole(value) -> bool:
-    try:
-        parse_whole(value)
-    except:
-        return False
-    return True
+import json
 
-def parse_whole(value) -> int:
-    if is_none(value):
-        return None
-    
-    if isinstance(value, int):
-        return value
-    
-    value_cleaned = re.sub("mm$", "", value.strip()).strip()
-    if value_cleaned != value:
-        print(value, "-->", value_cleaned)
-    
-    # 2+
+from concurrent.futures import ProcessPoolExecutor
 
-    # 5+-
+from ranges.sheets import SheetParser
+from ranges.specimen import WEIGHT_COLUMNS
+from ranges.units import DistanceUnit, WeightUnit
+from ranges.workbooks import read_headers, read_sheet
 
-    # 8-
+COLUMN_TYPES = {expected_column["column_name"]: expected_column["type"] for expected_column in SheetParser.expected_columns}
 
-    # 12*
+# Distinct failing values kept per column in the report
+FAILURE_EXAMPLES = 20
 
-    # [101]
 
-    # 8 mm
+@functools.lru_cache(maxsize=4096)
+def is_valid_cell(column_name: str, value: str) -> bool:
+    # Uses the same parsing core as the import, without its logging, so the answer matches what a full run would do
+    try:
+        match COLUMN_TYPES[column_name]:
+            case "decimal":
+                unit_type = WeightUnit if column_name in WEIGHT_COLUMNS else DistanceUnit
+                value_cleaned, _ = unit_type.split_value(value)
+                return SheetParser.parse_decimal_text(value_cleaned, value)[0] is not None
+            case "whole":
+                if column_name == "mvz_num":
+                    SheetParser.parse_mvz_guid(value)
+                    return True
+                return SheetParser.parse_integer_attribute(value)[0] is not None
+            case "distance_unit":
+                DistanceUnit.from_string(value)
+            case "mass_unit":
+                WeightUnit.from_string(value)
+    except ValueError:
+        return False
 
-    # 8 +-
+    return True
 
-    # 8mm
 
-    # 15in 15 in 
+def match_columns(columns) -> dict[str, str]:
+    # Maps each expected column to the header it was found under, the first valid name wins as in compile_header
+    matched = {}
+    for expected_column in SheetParser.expected_columns:
+        for valid_name in expected_column["valid_names"]:
+            if valid_name in columns:
+                matched[expected_column["column_name"]] = valid_name
+                break
 
-    # 5
-    return int(value_cleaned)
+    return matched
+
+
+def aliased_columns(matched: dict[str, str]) -> dict[str, str]:
+    default_names = {expected_column["column_name"]: expected_column["valid_names"][0] for expected_column in SheetParser.expected_columns}
+    return {column_name: source_name for column_name, source_name in matched.items() if source_name != default_names[column_name]}
+
+
+def scan_headers(file_name) -> list[dict]:
+    valid_names = set(valid_name for expected_column in SheetParser.expected_columns for valid_name in expected_column["valid_names"])
+
+    sheets = []
+    for sheet_name, columns in read_headers(file_name).items():
+        matched = match_columns(columns)
+        sheets.append({
+            "file_name": file_name,
+            "sheet_name": sheet_name,
+            "missing_columns": SheetParser.verify_columns_exist(columns),
+            "aliased_columns": aliased_columns(matched),
+            "unknown_columns": [column for column in columns if column not in valid_names],
+        })
+
+    return sheets
+
+
+class SheetReport:
+    file_name: str
+    sheet_name: str
+    missing_columns: list[str]
+    aliased_columns: dict[str, str]
+    rows: int
+    recorded: collections.Counter
+    failed: collections.Counter
+    failures: dict[str, collections.Counter]
+    errors: list[str]
+
+    def __init__(self, file_name: str, sheet_name: str = None):
+        self.file_name = file_name
+        self.sheet_name = sheet_name
+        self.missing_columns = []
+        self.aliased_columns = {}
+        self.rows = 0
+        self.recorded = collections.Counter()
+        self.failed = collections.Counter()
+        self.failures = collections.defaultdict(collections.Counter)
+        self.errors = []
+
+    def add_failure(self, column_name: str, value: str):
+        self.failed[column_name] += 1
+        self.failures[column_name][value] += 1
+
+    def failure_count(self) -> int:
+        return sum(self.failed.values()) + len(self.errors)
+
+    def to_dict(self) -> dict:
+        return {
+            "file_name": self.file_name,
+            "sheet_name": self.sheet_name,
+            "missing_columns": self.missing_columns,
+            "aliased_columns": self.aliased_columns,
+            "rows": self.rows,
+            "columns": {column_name: {"recorded": self.recorded[column_name], "failed": self.failed[column_name],
+                                      "examples": [value for value, _ in self.failures[column_name].most_common(FAILURE_EXAMPLES)]}
+                        for column_name in self.recorded},
+            "errors": self.errors,
+        }
+
+
+def verify_excel(file_name, sheet_name=None) -> SheetReport:
+    report = SheetReport(file_name, sheet_name)
+    columns, rows = read_sheet(file_name, sheet_name)
+
+    if len(columns) == 0:
+        return report
+
+    report.missing_columns = SheetParser.verify_columns_exist(columns)
+    if len(report.missing_columns) > 0:
+        print(f"Missing columns in {file_name} [{sheet_name}]", report.missing_columns)
 
-def is_valid_decimal(value) -> bool:
     try:
-        parse_decimal(value)
-    except:
-        return False
-    return True
+        plan = SheetParser.compile_header(columns)
+    except ValueError as err:
+        report.errors.append(str(err.args[0]))
+        return report
 
-def parse_decimal(value) -> float:
-    if is_none(value):
-        return None
-    
-    if isinstance(value, float):
-        return value
-    
-    value_cleaned = re.sub("mm$", "", value.strip()).strip()
-    if value_cleaned != value:
-        print(value, "-->", value_cleaned)
-    
-    try:
-        return float(parse_decimal(value_cleaned))
-    except:
-        matched = re.match("([0-9]+) ([0-9+])/([1-9][0-9]*)", value_cleaned)
+    report.aliased_columns = aliased_columns(dict(zip(plan.column_names, plan.source_names)))
 
-        if matched:
-            return float(matched.group(1)) + float(matched.group(2)) / float(matched.group(3))
-        else:
-            return float(value_cleaned)
+    # Each cell is classified once, the plan only yields columns the sheet actually has
+    for row in rows:
+        report.rows += 1
 
+        try:
+            record = plan.extract(row)
+        except ValueError as err:
+            report.errors.append(f"{err.args[0]}: {err.args[1]} != {err.args[2]}")
+            continue
 
-def verify_columns_exist(columns):
-    missing_columns = []
+        # The import stops on a row without a catalog number, so it is a row error rather than an empty cell
+        if record["mvz_num"] is None:
+            report.errors.append(f"Missing mvz_num in data row {report.rows}")
 
-    for expected_column in expected_columns:
-        found = False
-        for valid_name in expected_column["valid_names"]:
-            if valid_name in columns:
-                found = True
-        
-        if not found and not expected_column["optional"]:
-            missing_columns.append(expected_column["column_name"])
+        for column_name in plan.column_names:
+            value = record[column_name]
+            if value is None:
+                continue
 
-    return missing_columns
+            report.recorded[column_name] += 1
+            if not is_valid_cell(column_name, value):
+                report.add_failure(column_name, value)
 
-def extract_record(raw_record):
-    record = {}
+    for column_name, values in report.failures.items():
+        for value in values:
+            print(f"Could not parse '{column_name}': '{value}'")
 
-    for expected_column in expected_columns:
-        found = False
-        for valid_name in expected_column["valid_names"]:
-            if valid_name in raw_record:
-                record[expected_column["column_name"]] = raw_record[valid_name]
-                found = True
-                break
-        
-        if not found and expected_column["optional"]:
-            record[expected_column["column_name"]] = None
+    for error in report.errors:
+        print(error)
 
-    return record
+    return report
 
 
-def is_valid_distance_unit(value):
-    try:
-        parse_distance_unit(value)
-        return True
-    except:
-        return False
+def verify_workbooks(accession_files, workers=1, sheets=None) -> list[SheetReport]:
+    # Every sheet the import would read is checked, one task per (file, sheet) as in import_accessions
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
 
-def parse_distance_unit(value):
-    if is_none(value):
-        return "mm"
+    try:
+        mapper = executor.map if executor is not None and len(accession_files) > 1 else map
+        tasks = [(accession_file, sheet_name)
+                 for accession_file, file_headers in zip(accession_files, mapper(read_headers, accession_files))
+                 for sheet_name, columns in file_headers.items()
+                 if len(columns) > 0 and (sheets is None or sheet_name in sheets)]
 
-    value_cleaned = re.sub("\.", "", value.strip())
+        if executor is not None and len(tasks) > 1:
+            return list(executor.map(verify_excel, *zip(*tasks)))
 
-    if value_cleaned == "inches":
-        return "in"
+        return [verify_excel(*task) for task in tasks]
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
-    valid_units = ["mm", "in"]
-    if value_cleaned in valid_units:
-        return value_cleaned
-    
-    if value_cleaned == "":
-        return "mm"
 
-    raise ValueError("Cannot convert value to distance unit", value, value_cleaned)
+def scan_all_headers(accession_files, workers=1, output=None):
+    if workers > 1 and len(accession_files) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            sheets = [sheet for file_sheets in executor.map(scan_headers, accession_files) for sheet in file_sheets]
+    else:
+        sheets = [sheet for accession_file in accession_files for sheet in scan_headers(accession_file)]
 
-def is_valid_mass_unit(value):
-    try:
-        verify_mass_unit(value)
-        return True
-    except:
-        return False
+    missing = collections.Counter()
+    aliases = collections.Counter()
+    for sheet in sheets:
+        if len(sheet["missing_columns"]) > 0:
+            print(f"Missing columns in {sheet['file_name']} [{sheet['sheet_name']}]", sheet["missing_columns"])
 
-def verify_mass_unit(value):
-    if is_none(value):
-        return "g"
+        missing.update(sheet["missing_columns"])
+        aliases.update(f"{column_name} <- {source_name}" for column_name, source_name in sheet["aliased_columns"].items())
 
-    value_cleaned = re.sub("\.", "", value.strip())
+    print(f"{len(sheets)} sheets in {len(accession_files)} workbooks, {sum(1 for sheet in sheets if sheet['missing_columns'])} missing required columns")
+    for column_name, count in missing.most_common():
+        print(f"  missing {column_name}: {count} sheets")
+    for alias, count in aliases.most_common():
+        print(f"  alias {alias}: {count} sheets")
 
-    valid_units = ["g"]
-    if value_cleaned in valid_units:
-        return value_cleaned
-    
-    if value_cleaned == "":
-        return "g"
+    if output is not None:
+        with open(output, "w", encoding="utf8") as output_file:
+            json.dump(sheets, output_file, indent=4)
 
-    raise ValueError("Cannot convert value to distance unit", value, value_cleaned)
+    return sheets
 
-def verify_excel(file_name):
-    accession_data = pd.read_excel(file_name, dtype=str)
-    accession_data = accession_data.to_dict(orient="records")
 
-    if len(accession_data) == 0:
+def main():
+    parser = argparse.ArgumentParser(description='Checks accession sheets parse cleanly without running the full import')
+    parser.add_argument('--input', type=str, default=".\\data\\*.xlsx")
+    parser.add_argument('--workers', type=int, default=1, help="Number of processes used to check workbooks")
+    parser.add_argument('--output', type=str, default=None, help="Write the per column report as JSON")
+    parser.add_argument('--headers', action="store_true", help="Only check the header row of every sheet for missing and aliased columns")
+    parser.add_argument('--sheets', type=str, nargs="*", default=None, help="Only check sheets with these names, every sheet is checked by default")
+    args = parser.parse_args()
+
+    accession_files = sorted(glob.glob(args.input))
+
+    if args.headers:
+        scan_all_headers(accession_files, args.workers, args.output)
         return
 
-    missing_columns = verify_columns_exist(accession_data[0].keys())
-    if len(missing_columns) > 0:
-        print(f"Missing columns in {file_name}", missing_columns)
-
-
-    failures = set()
-    for raw_record in accession_data:
-        record = extract_record(raw_record)
-
-        for expected_column in expected_columns:
-            is_valid = True
-            match expected_column["type"]:
-                case "decimal":
-                    is_valid = is_valid_decimal(record[expected_column["column_name"]])
-                case "whole":
-                    is_valid = is_valid_decimal(record[expected_column["column_name"]])
-                case "distance_unit":
-                    is_valid = is_valid_distance_unit(record[expected_column["column_name"]])
-                case "mass_unit":
-                    is_valid = is_valid_mass_unit(record[expected_column["column_name"]])
-            
-            if not is_valid:
-                failures.add(f"Could not parse '{expected_column['column_name']}': '{record[expected_column['column_name']]}'")
-    
-    if len(failures) != 0:
-        for failure in failures:
-            print(failure)
-
+    reports = verify_workbooks(accession_files, args.workers, args.sheets)
 
-def main():
-    accession_files = glob.glob(".\\data\\*.xlsx")
+    for report in reports:
+        print(f"{report.file_name} [{report.sheet_name}]: {report.rows} rows, {report.failure_count()} failures")
 
-    for accession_file in accession_files:
-        print(accession_file)
-        verify_excel(file_name=accession_file)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf8") as output_file:
+            json.dump([report.to_dict() for report in reports], output_file, indent=4)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
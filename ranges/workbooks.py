@@ -0,0 +1,76 @@
+import openpyxl
+
+# Strings which pandas.read_excel treats as missing by default
+NA_VALUES = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+             "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+
+def convert_cell(value):
+    if value is None:
+        return None
+
+    if isinstance(value, str):
+        return None if value in NA_VALUES else value
+
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+
+    return str(value)
+
+
+def header_columns(header) -> list[str]:
+    header = list(header or [])
+
+    while len(header) > 0 and header[-1] is None:
+        header.pop()
+
+    return [f"Unnamed: {index}" if name is None else name for index, name in enumerate(header)]
+
+
+def read_sheet(file_name, sheet_name=None):
+    workbook = openpyxl.load_workbook(file_name, read_only=True, data_only=True)
+    worksheet = workbook.worksheets[0] if sheet_name is None else workbook[sheet_name]
+
+    rows = worksheet.iter_rows(values_only=True)
+    columns = header_columns(next(rows, None))
+
+    if len(columns) == 0:
+        workbook.close()
+        return [], iter(())
+
+    return columns, _iter_rows(workbook, rows, len(columns))
+
+
+def read_headers(file_name) -> dict[str, list[str]]:
+    # Only the first row of each sheet is parsed, the cell data past it is never read
+    workbook = openpyxl.load_workbook(file_name, read_only=True, data_only=True)
+
+    try:
+        return {worksheet.title: header_columns(next(worksheet.iter_rows(max_row=1, values_only=True), None))
+                for worksheet in workbook.worksheets}
+    finally:
+        workbook.close()
+
+
+def _iter_rows(workbook, rows, width):
+    try:
+        for row in rows:
+            values = tuple(convert_cell(value) for value in row[:width])
+
+            # Blank rows carry no specimen, read-only sheets often report trailing ones
+            if all(value is None for value in values):
+                continue
+
+            if len(values) < width:
+                values = values + (None,) * (width - len(values))
+
+            yield values
+    finally:
+        workbook.close()
+
+
+def read_records(file_name, sheet_name=None):
+    columns, rows = read_sheet(file_name, sheet_name)
+
+    for row in rows:
+        yield dict(zip(columns, row))
@@ -1,9 +1,11 @@
+import pickle
+import tracemalloc
 import unittest
 
 from decimal import Decimal
 from deepdiff import DeepDiff
 
-from ranges.specimen import Specimen, ReviewNeededException
+from ranges.specimen import CommonData, ReproductiveData, Specimen, ReviewNeededException
 from ranges.units import DistanceUnit, WeightUnit
 
 class TestSpecimenParser(unittest.TestCase):
@@ -261,6 +263,43 @@ class TestSpecimenParser(unittest.TestCase):
         with self.assertRaises(ReviewNeededException):
             specimen = Specimen.from_raw_record(raw_record)
 
+    def test_specimen_memory(self):
+        # Subclasses without __slots__ get a __dict__ again, matching the previous dict-backed layout
+        class DictCommonData(CommonData):
+            pass
+
+        class DictReproductiveData(ReproductiveData):
+            pass
+
+        class DictSpecimen(Specimen):
+            pass
+
+        measurement = (Decimal(95), DistanceUnit.MILLIMETERS, None)
+        count = 2000
+
+        def bytes_per_specimen(specimen_type, common_type, reproductive_type):
+            tracemalloc.start()
+            specimens = [specimen_type(f"MVZ:Mamm:{index}", None, None,
+                                       common_type(*[measurement] * 6, None),
+                                       reproductive_type(measurement, measurement, (None, None), (None, None),
+                                                         (None, None), measurement, None, None))
+                         for index in range(count)]
+            allocated, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.assertEqual(len(specimens), count)
+            return allocated / count
+
+        before = bytes_per_specimen(DictSpecimen, DictCommonData, DictReproductiveData)
+        after = bytes_per_specimen(Specimen, CommonData, ReproductiveData)
+
+        self.assertLess(after, before * 0.75,
+                        f"bytes per specimen: {before:.0f} dict-backed, {after:.0f} with __slots__")
+
+        specimen = Specimen("MVZ:Mamm:12345", None, None, CommonData(*[measurement] * 6, None), None)
+        self.assertFalse(hasattr(specimen, "__dict__"))
+        self.assertEqual(pickle.loads(pickle.dumps(specimen)).common_data.weight, measurement)
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
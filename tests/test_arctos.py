@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+from ranges.arctos import ArctosStore
+
+class TestArctosStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.temp_dir.name, "arctos_data.csv")
+
+        with open(self.csv_path, "w", encoding="utf8", newline="") as csv_file:
+            csv_file.write("collection_object_id,guid,ended_date,collectors,total length,weight\n")
+            csv_file.write("1,MVZ:Mamm:12345,1982-06-28,\"Richard M. Warner, James L. Patton\",95,\n")
+            csv_file.write("2,MVZ:Mamm:12346,2009-09-15,James L. Patton,NA,41\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_lookup(self):
+        store = ArctosStore.open(self.csv_path)
+
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir.name, "arctos_data.sqlite")))
+        self.assertIn("MVZ:Mamm:12345", store)
+        self.assertNotIn("MVZ:Mamm:99999", store)
+
+        self.assertEqual(store.get("MVZ:Mamm:12345", ("collectors", "ended_date")),
+                         ("Richard M. Warner, James L. Patton", "1982-06-28"))
+        self.assertEqual(store.get("MVZ:Mamm:12345", ("weight",)), ("",))
+        self.assertEqual(store.get("MVZ:Mamm:12346", ("total length",)), ("",))
+        self.assertIsNone(store.get("MVZ:Mamm:99999", ("weight",)))
+
+        with self.assertRaises(KeyError):
+            store.get("MVZ:Mamm:12345", ("ear from crown",))
+
+        store.close()
+
+    def test_presence(self):
+        store = ArctosStore.open(self.csv_path)
+        presence = store.presence(["MVZ:Mamm:12345", "MVZ:Mamm:12346", "MVZ:Mamm:99999"], ["total length", "weight"])
+
+        self.assertEqual(sorted(presence.itertuples(index=False, name=None)), [
+            ("MVZ:Mamm:12345", "total length", True),
+            ("MVZ:Mamm:12345", "weight", False),
+            ("MVZ:Mamm:12346", "total length", False),
+            ("MVZ:Mamm:12346", "weight", True),
+        ])
+
+        with self.assertRaises(KeyError):
+            store.presence(["MVZ:Mamm:12345"], ["ear from crown"])
+
+        store.close()
+
+    def test_limited_columns(self):
+        store = ArctosStore.open(self.csv_path, attributes=["weight", "ear from crown"])
+
+        self.assertEqual(store.columns, ["guid", "ended_date", "collectors", "weight"])
+        self.assertEqual(store.get("MVZ:Mamm:12346", ("collectors", "weight")), ("James L. Patton", "41"))
+        store.close()
+
+    def test_header_checks(self):
+        with open(self.csv_path, "w", encoding="utf-8-sig", newline="") as csv_file:
+            csv_file.write("guid,collectors,ended_date\n")
+            csv_file.write("MVZ:Mamm:12345,James L. Patton,2009-09-15\n")
+
+        store = ArctosStore.open(self.csv_path)
+        self.assertEqual(store.columns, ["guid", "collectors", "ended_date"])
+        self.assertIn("MVZ:Mamm:12345", store)
+        store.close()
+
+        with open(self.csv_path, "w", encoding="utf8", newline="") as csv_file:
+            csv_file.write("guid,weight,collectors,weight\n")
+            csv_file.write("MVZ:Mamm:12345,41,James L. Patton,42\n")
+
+        with self.assertRaisesRegex(ValueError, "duplicate columns: weight"):
+            ArctosStore.open(self.csv_path)
+
+    def test_failed_build_is_cleaned_up(self):
+        store_path = os.path.join(self.temp_dir.name, "arctos_data.sqlite")
+        # Enough good rows that the bad bytes are decoded after the store has been opened
+        with open(self.csv_path, "ab") as csv_file:
+            for index in range(5000):
+                csv_file.write(f"{index + 3},MVZ:Mamm:{20000 + index},2009-09-15,James L. Patton,,\n".encode("utf8"))
+            csv_file.write(b"3,MVZ:Mamm:12347,2009-09-15,\xff\xfe,,\n")
+
+        with self.assertRaises(UnicodeDecodeError):
+            ArctosStore.open(self.csv_path)
+
+        self.assertFalse(os.path.exists(store_path))
+        self.assertFalse(os.path.exists(store_path + ".tmp"))
+
+    def test_snapshot_reuse(self):
+        store_path = os.path.join(self.temp_dir.name, "arctos_data.sqlite")
+        ArctosStore.open(self.csv_path).close()
+
+        with mock.patch.object(ArctosStore, "build") as build:
+            # Touching the csv without changing it keeps the store
+            os.utime(self.csv_path, ns=(0, 10 ** 18))
+            ArctosStore.open(self.csv_path).close()
+            self.assertTrue(ArctosStore.is_current(store_path, self.csv_path))
+
+            # Asking for different columns does not
+            self.assertFalse(ArctosStore.is_current(store_path, self.csv_path, ["guid", "collectors", "ended_date"]))
+
+            build.assert_not_called()
+
+        with open(self.csv_path, "a", encoding="utf8", newline="") as csv_file:
+            csv_file.write("3,MVZ:Mamm:12347,2009-09-15,James L. Patton,,\n")
+
+        self.assertFalse(ArctosStore.is_current(store_path, self.csv_path))
+        store = ArctosStore.open(self.csv_path)
+        self.assertIn("MVZ:Mamm:12347", store)
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
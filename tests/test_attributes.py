@@ -0,0 +1,48 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from ranges.attributes import AttributeWriter, TEXT_COLUMNS, write_rows
+
+ROWS = [("MVZ:Mamm:12345", "reproductive data", "t=3x2 mm", "2009-09-15", "James L. Patton"),
+        ("MVZ:Mamm:12346", "reproductive data", "scars 2R, 1L", "2009-09-15", None)]
+
+class TestAttributeWriter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "text_attributes.csv")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_write_rows(self):
+        write_rows(self.path, TEXT_COLUMNS, iter(ROWS * 3))
+
+        with open(self.path, "r", encoding="utf8", newline="") as csv_file:
+            lines = csv_file.read().split(os.linesep)
+
+        self.assertEqual(lines[0], ",".join(TEXT_COLUMNS))
+        self.assertEqual(lines[2], 'MVZ:Mamm:12346,reproductive data,"scars 2R, 1L",2009-09-15,')
+        self.assertEqual(len(lines), 8)
+        self.assertEqual(os.listdir(self.temp_dir.name), ["text_attributes.csv"])
+
+    def test_gzip_chunks(self):
+        with AttributeWriter(self.path + ".gz", TEXT_COLUMNS, compress=True, chunk_size=3) as writer:
+            writer.write_rows(ROWS * 5)
+
+        self.assertEqual(writer.rows_written, 10)
+        with gzip.open(self.path + ".gz", "rt", encoding="utf8", newline="") as csv_file:
+            self.assertEqual(len(csv_file.read().split(os.linesep)), 12)
+
+    def test_failure_leaves_no_output(self):
+        with self.assertRaises(RuntimeError):
+            with AttributeWriter(self.path, TEXT_COLUMNS) as writer:
+                writer.write_rows(ROWS)
+                raise RuntimeError("export failed")
+
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import json
+import os
+import tempfile
+import unittest
+
+from ranges.boundaries import BoundaryIndex
+
+class TestBoundaryIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "states.geojson")
+
+        features = [
+            {
+                "type": "Feature",
+                "properties": {"name": "Square"},
+                "geometry": {"type": "Polygon", "coordinates": [
+                    [[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]],
+                    [[1, 1], [2, 1], [2, 2], [1, 2], [1, 1]],
+                ]},
+            },
+            {
+                "type": "Feature",
+                "properties": {"name": "Islands"},
+                "geometry": {"type": "MultiPolygon", "coordinates": [
+                    [[[10, 10], [11, 10], [11, 11], [10, 11], [10, 10]]],
+                    [[[-20.5, 30.5], [-19.5, 30.5], [-20, 31.5], [-20.5, 30.5]]],
+                ]},
+            },
+        ]
+
+        with open(self.path, "w", encoding="utf8") as geojson_file:
+            json.dump({"type": "FeatureCollection", "features": features}, geojson_file)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_classify(self):
+        index = BoundaryIndex.load_geojson([self.path], cell_size=1.5)
+
+        latitudes = [3, 1.5, 10.5, 31, 31.4, 50, None]
+        longitudes = [3, 1.5, 10.5, -20, -20.5, 50, 3]
+
+        self.assertEqual(index.classify(latitudes, longitudes),
+                         ["Square", None, "Islands", "Islands", None, None, None])
+
+
+if __name__ == "__main__":
+    unittest.main()
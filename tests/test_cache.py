@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+from ranges import cache
+from ranges.cache import ParseCache
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.temp_dir.name, "14609.xlsx")
+        with open(self.file_name, "wb") as workbook:
+            workbook.write(b"first version")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        parse_cache = ParseCache(os.path.join(self.temp_dir.name, "cache"))
+        self.assertIsNone(parse_cache.load(self.file_name))
+
+        parse_cache.store(self.file_name, "Sheet1", ["specimen"], [("MVZ:Mamm:12345", "check weight", "Sheet1")])
+        self.assertEqual(parse_cache.load(self.file_name, "Sheet1"), (["specimen"], [("MVZ:Mamm:12345", "check weight", "Sheet1")]))
+        self.assertIsNone(parse_cache.load(self.file_name, "Sheet2"))
+
+        self.assertIsNone(ParseCache(parse_cache.directory, read=False).load(self.file_name, "Sheet1"))
+
+        with mock.patch.object(cache, "PARSER_VERSION", cache.PARSER_VERSION + 1):
+            self.assertIsNone(ParseCache(parse_cache.directory).load(self.file_name, "Sheet1"))
+
+    def test_headers(self):
+        parse_cache = ParseCache(os.path.join(self.temp_dir.name, "cache"))
+        self.assertIsNone(parse_cache.load_headers(self.file_name))
+
+        headers = {"Spring": ["MVZ #", "total"], "Notes": ["remarks"]}
+        parse_cache.store_headers(self.file_name, headers)
+        parse_cache.store(self.file_name, "Spring", ["specimen"], [])
+
+        self.assertEqual(ParseCache(parse_cache.directory).load_headers(self.file_name), headers)
+        self.assertEqual(ParseCache(parse_cache.directory).load(self.file_name, "Spring"), (["specimen"], []))
+
+        with open(self.file_name, "wb") as workbook:
+            workbook.write(b"second version")
+
+        self.assertIsNone(ParseCache(parse_cache.directory).load_headers(self.file_name))
+
+    def test_content_change(self):
+        parse_cache = ParseCache(os.path.join(self.temp_dir.name, "cache"))
+        parse_cache.store(self.file_name, "Sheet1", ["specimen"], [])
+
+        with open(self.file_name, "wb") as workbook:
+            workbook.write(b"second version")
+
+        self.assertIsNone(ParseCache(parse_cache.directory).load(self.file_name, "Sheet1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import openpyxl
+
+from main import import_accessions, import_excel_timed, select_new_attributes
+from ranges.arctos import ArctosStore
+from ranges.attributes import AttributeColumns, TEXT_COLUMNS
+from ranges.cache import ParseCache
+
+HEADER = ["MVZ #", "total", "tail", "hf", "ear", "unit", "wt", "units", "repro comments", "REVIEW NEEDED"]
+
+class TestImportAccessions(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.temp_dir.name, "14609.xlsx")
+
+        workbook = openpyxl.Workbook()
+        spring = workbook.active
+        spring.title = "Spring"
+        spring.append(HEADER)
+        spring.append([12345, "95", "41", "11", "6", "mm", "4", "g", None, None])
+
+        fall = workbook.create_sheet("Fall")
+        fall.append(HEADER)
+        fall.append([12346, "192", "65", "14", "7", "mm", "41", "g", None, None])
+        fall.append([12347, "216", "60", "14", "7", "mm", "40", "g", None, "check weight"])
+
+        workbook.create_sheet("Notes").append(["remarks"])
+        workbook.save(self.file_name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_every_sheet(self):
+        specimens, review_needed = import_accessions([self.file_name])
+
+        self.assertEqual([(specimen.guid, specimen.sheet_name) for specimen in specimens],
+                         [("MVZ:Mamm:12345", "Spring"), ("MVZ:Mamm:12346", "Fall")])
+        self.assertEqual(review_needed, {self.file_name: [("MVZ:Mamm:12347", "check weight", "Fall")]})
+
+    def test_sheets_of_one_workbook_in_parallel(self):
+        serial = import_accessions([self.file_name])
+
+        # Threads stand in for worker processes so the submitted tasks can be inspected
+        with mock.patch("main.ProcessPoolExecutor", ThreadPoolExecutor), \
+                mock.patch.object(ThreadPoolExecutor, "map", autospec=True, side_effect=ThreadPoolExecutor.map) as executor_map:
+            parallel = import_accessions([self.file_name], workers=2)
+
+        self.assertEqual([(specimen.guid, specimen.sheet_name) for specimen in parallel[0]],
+                         [(specimen.guid, specimen.sheet_name) for specimen in serial[0]])
+        self.assertEqual(parallel[1], serial[1])
+        self.assertEqual([call.args[1] for call in executor_map.call_args_list], [import_excel_timed])
+
+    def test_cached_workbooks_are_not_opened(self):
+        cache_dir = os.path.join(self.temp_dir.name, "cache")
+        first = import_accessions([self.file_name], cache=ParseCache(cache_dir))
+
+        with mock.patch("main.read_headers", side_effect=AssertionError("workbook opened")), \
+                mock.patch("main.read_sheet", side_effect=AssertionError("workbook opened")):
+            second = import_accessions([self.file_name], cache=ParseCache(cache_dir))
+
+        self.assertEqual([specimen.guid for specimen in second[0]], [specimen.guid for specimen in first[0]])
+        self.assertEqual(second[1], first[1])
+
+    def test_sheet_subset(self):
+        specimens, review_needed = import_accessions([self.file_name], sheets=["Fall"])
+
+        self.assertEqual([specimen.guid for specimen in specimens], ["MVZ:Mamm:12346"])
+        self.assertEqual(len(review_needed[self.file_name]), 1)
+
+
+class TestSelectNewAttributes(unittest.TestCase):
+    def test_anti_join(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_path = os.path.join(temp_dir, "arctos_data.csv")
+            with open(csv_path, "w", encoding="utf8", newline="") as csv_file:
+                csv_file.write("guid,ended_date,collectors,reproductive data,unformatted measurements\n")
+                csv_file.write("MVZ:Mamm:12345,2009-09-15,James L. Patton,scrotal,\n")
+                csv_file.write("MVZ:Mamm:12346,2009-09-15,James L. Patton,,\n")
+
+            attributes = AttributeColumns(TEXT_COLUMNS)
+            attributes.append("MVZ:Mamm:12345", "reproductive data", "T 3x2", "2009-09-15", None)
+            attributes.append("MVZ:Mamm:12345", "unformatted measurements", "skull only", "2009-09-15", None)
+            attributes.append("MVZ:Mamm:12346", "reproductive data", "nulliparous", "2009-09-15", None)
+            attributes.append("MVZ:Mamm:12346", "reproductive data", "scars", "2009-09-15", None)
+            attributes.append("MVZ:Mamm:99999", "reproductive data", "scrotal", "2009-09-15", None)
+
+            store = ArctosStore.open(csv_path)
+            unknown_guids = set()
+            with self.assertLogs("main", "WARNING"):
+                rows = select_new_attributes(attributes, store, set(), unknown_guids)
+            store.close()
+
+        self.assertEqual(rows, [("MVZ:Mamm:12345", "unformatted measurements", "skull only", "2009-09-15", None),
+                                ("MVZ:Mamm:12346", "reproductive data", "nulliparous", "2009-09-15", None)])
+        self.assertEqual(unknown_guids, {"MVZ:Mamm:99999"})
+
+    def test_duplicates_across_chunks(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_path = os.path.join(temp_dir, "arctos_data.csv")
+            with open(csv_path, "w", encoding="utf8", newline="") as csv_file:
+                csv_file.write("guid,ended_date,collectors,reproductive data\n")
+                csv_file.write("MVZ:Mamm:12345,2009-09-15,James L. Patton,\n")
+                csv_file.write("MVZ:Mamm:12346,2009-09-15,James L. Patton,\n")
+
+            first = AttributeColumns(TEXT_COLUMNS)
+            first.append("MVZ:Mamm:12345", "reproductive data", "T 3x2", "2009-09-15", None)
+            first.append("MVZ:Mamm:12346", "reproductive data", "scrotal", "2009-09-15", None)
+            second = AttributeColumns(TEXT_COLUMNS)
+            second.append("MVZ:Mamm:12345", "reproductive data", "T 4x2", "2009-09-15", None)
+
+            store = ArctosStore.open(csv_path)
+            seen = set()
+            first_rows = select_new_attributes(first, store, seen, set())
+            with self.assertLogs("main", "WARNING") as logs:
+                second_rows = select_new_attributes(second, store, seen, set())
+            store.close()
+
+        # The first value for a key wins, later chunks only log the repeat
+        self.assertEqual(first_rows, [("MVZ:Mamm:12345", "reproductive data", "T 3x2", "2009-09-15", None),
+                                      ("MVZ:Mamm:12346", "reproductive data", "scrotal", "2009-09-15", None)])
+        self.assertEqual(second_rows, [])
+        self.assertEqual(logs.output, ["WARNING:main:Duplicate entries found for guid: MVZ:Mamm:12345, attribute: reproductive data"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+import unittest
+
+from ranges.instrumentation import RunReport
+
+class TestRunReport(unittest.TestCase):
+    def test_stages_and_counters(self):
+        report = RunReport()
+
+        with report.stage("parse"):
+            report.count("rows", 10)
+        with report.stage("parse"):
+            report.count("rows", 5)
+
+        self.assertEqual(report.stages["parse"]["calls"], 2)
+        self.assertEqual(report.counters["rows"], 15)
+
+        worker_report = RunReport()
+        with worker_report.stage("parse"):
+            worker_report.count("rows", 3)
+
+        report.merge(worker_report.to_dict())
+        self.assertEqual(report.stages["parse"]["calls"], 3)
+        self.assertEqual(report.counters["rows"], 18)
+
+    def test_write(self):
+        report = RunReport()
+        with report.stage("export"):
+            pass
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "run_report.json")
+            report.write(path, arguments={"workers": 1})
+
+            with open(path, "r", encoding="utf8") as report_file:
+                written = json.load(report_file)
+
+        self.assertEqual(written["arguments"], {"workers": 1})
+        self.assertIn("export", written["stages"])
+
+
+if __name__ == "__main__":
+    unittest.main()
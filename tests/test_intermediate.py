@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+from ranges import intermediate
+from ranges.arctos import ArctosStore
+from ranges.specimen import Specimen
+
+RECORD = {
+    "mvz_num": "12345", "collector": "Richard M. Warner", "date": None,
+    "total_length": "14 3/8", "tail_length": "41.50", "hind_foot_with_claw": "11+", "ear": None,
+    "ear_from_notch": "6", "ear_from_crown": None, "distance_unit": "in", "weight": "4 oz", "weight_unit": "g",
+    "repro_comments": "T 3x2", "testes_length": None, "testes_width": None, "embryo_count": "3",
+    "embryo_count_left": "x", "embryo_count_right": None, "crown_rump_length": None, "scars": None,
+    "unformatted_measurements": "skull only", "review_needed": None,
+}
+
+@unittest.skipIf(intermediate.pa is None, "pyarrow is not installed")
+class TestIntermediateTables(unittest.TestCase):
+    def test_round_trip(self):
+        specimens, _ = Specimen.from_records([RECORD])
+        specimens[0].sheet_name = "Spring"
+        review_needed = {"14609.xlsx": [("MVZ:Mamm:12346", "check weight", "Spring")]}
+
+        with tempfile.TemporaryDirectory() as directory:
+            intermediate.save_specimens(directory, specimens, review_needed)
+            loaded, loaded_review_needed = intermediate.load_specimens(directory)
+
+        self.assertEqual(loaded_review_needed, review_needed)
+        self.assertEqual(loaded[0].sheet_name, "Spring")
+        self.assertEqual(loaded[0].common_data.tail_length, specimens[0].common_data.tail_length)
+        self.assertEqual(str(loaded[0].common_data.tail_length[0]), "41.50")
+        self.assertEqual(loaded[0].reproductive_data.embryo_count_left, (None, "x"))
+        self.assertEqual(loaded[0].export_attributes(), specimens[0].export_attributes())
+
+    def test_float_derived_values(self):
+        # Float cells arrive as their repr, with more fractional digits than a fixed decimal scale holds
+        record = dict(RECORD, total_length="0.30000000000000004", tail_length="12.3456789012345", weight="1E+2")
+        specimens, _ = Specimen.from_records([record, RECORD])
+
+        with tempfile.TemporaryDirectory() as directory:
+            intermediate.save_specimens(directory, specimens, {})
+            with mock.patch.object(intermediate, "LOAD_BATCH_SIZE", 1):
+                loaded, _ = intermediate.load_specimens(directory)
+
+        self.assertEqual(len(loaded), 2)
+
+        self.assertEqual(str(loaded[0].common_data.total_length[0]), "0.30000000000000004")
+        self.assertEqual(str(loaded[0].common_data.tail_length[0]), "12.3456789012345")
+        self.assertEqual(loaded[0].common_data.weight, specimens[0].common_data.weight)
+        self.assertEqual(loaded[0].export_attributes(), specimens[0].export_attributes())
+
+    def test_arctos_reference(self):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "arctos_data.csv")
+            with open(csv_path, "w", encoding="utf8", newline="") as csv_file:
+                csv_file.write("guid,ended_date,collectors,total length,weight\n")
+                csv_file.write("MVZ:Mamm:12345,1982-06-28,Richard M. Warner,95,\n")
+                csv_file.write("MVZ:Mamm:12346,2009-09-15,James L. Patton,,41\n")
+
+            store = ArctosStore.open(csv_path)
+            intermediate.save_arctos_reference(directory, store)
+            reference = intermediate.load_arctos_reference(directory)
+
+            guids = ["MVZ:Mamm:12346", "MVZ:Mamm:99999", "MVZ:Mamm:12345"]
+            self.assertEqual(sorted(reference.presence(guids, ["total length", "weight"]).itertuples(index=False, name=None)),
+                             sorted(store.presence(guids, ["total length", "weight"]).itertuples(index=False, name=None)))
+            self.assertEqual(reference.get("MVZ:Mamm:12346", ("collectors", "weight")), ("James L. Patton", "41"))
+            self.assertIsNone(reference.get("MVZ:Mamm:99999", ("collectors",)))
+            self.assertIn("MVZ:Mamm:12345", reference)
+            self.assertNotIn("MVZ:Mamm:99999", reference)
+
+            with self.assertRaises(KeyError):
+                reference.get("MVZ:Mamm:12345", ("ear from crown",))
+
+            store.close()
+
+        # Later rows for a guid win, as in the SQLite store
+        table = intermediate.pa.table({"guid": ["MVZ:Mamm:1", "MVZ:Mamm:2", "MVZ:Mamm:1"], "weight": ["4", None, "5"]})
+        reference = intermediate.ArctosReference(table)
+        self.assertEqual(reference.get("MVZ:Mamm:1", ("weight",)), ("5",))
+        self.assertEqual(sorted(reference.presence(["MVZ:Mamm:1", "MVZ:Mamm:2"], ["weight"]).itertuples(index=False, name=None)),
+                         [("MVZ:Mamm:1", "weight", True), ("MVZ:Mamm:2", "weight", False)])
+
+    def test_copy_arctos_reference(self):
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as destination:
+            intermediate.pq.write_table(intermediate.pa.table({"guid": ["MVZ:Mamm:1"], "weight": ["4"]}),
+                                        os.path.join(source, intermediate.ARCTOS_FILE))
+
+            # Saving into the directory a run loaded from leaves the file in place
+            intermediate.copy_arctos_reference(source, source)
+            intermediate.copy_arctos_reference(source, destination)
+
+            reference = intermediate.load_arctos_reference(destination)
+            self.assertEqual(reference.get("MVZ:Mamm:1", ("weight",)), ("4",))
+
+
+class TestMissingPyarrow(unittest.TestCase):
+    def test_informative_error(self):
+        with mock.patch.object(intermediate, "pa", None):
+            with self.assertRaisesRegex(ImportError, "pip install pyarrow"):
+                intermediate.save_specimens(os.curdir, [], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import http.server
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from urllib.parse import parse_qs, urlparse
+
+from ranges.maps import GeocodeError, GoogleGeocoder, LocationCache, ReverseGeocoder, extract_location_of_type, project_location, \
+    read_located_specimens, trim_partial_line
+
+class StubGeocodeHandler(http.server.BaseHTTPRequestHandler):
+    requests_seen = []
+    # Statuses returned to the next requests, OK once these run out
+    statuses = []
+
+    def do_GET(self):
+        latlng = parse_qs(urlparse(self.path).query)["latlng"][0]
+        StubGeocodeHandler.requests_seen.append(latlng)
+
+        status = StubGeocodeHandler.statuses.pop(0) if StubGeocodeHandler.statuses else "OK"
+        if status == "OK":
+            body = {"status": status, "results": [{"address_components": [
+                {"long_name": "United States", "types": ["country", "political"]},
+                {"long_name": "California", "types": ["administrative_area_level_1", "political"]},
+            ]}], "latlng": latlng}
+        else:
+            body = {"status": status, "results": [], "error_message": "stubbed failure"}
+
+        body = json.dumps(body).encode("utf8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestReverseGeocoder(unittest.TestCase):
+    def setUp(self):
+        StubGeocodeHandler.requests_seen = []
+        StubGeocodeHandler.statuses = []
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubGeocodeHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.provider = GoogleGeocoder(api_key="test", base_url=f"http://127.0.0.1:{self.server.server_port}/geocode")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def test_locate_all(self):
+        cache = LocationCache(os.path.join(self.temp_dir.name, "locations.sqlite"))
+        geocoder = ReverseGeocoder(self.provider, cache, requests_per_second=0, workers=4)
+
+        coordinates = [(37.87151, -122.25946), (37.871512, -122.259461), (None, None), (34.05, -118.25)]
+        location_infos = geocoder.locate_all(coordinates)
+
+        self.assertIsNone(location_infos[2])
+        self.assertEqual(location_infos[0], location_infos[1])
+        self.assertEqual(extract_location_of_type(location_infos[3], "administrative_area_level_1"), "California")
+        self.assertEqual(sorted(StubGeocodeHandler.requests_seen), ["34.05,-118.25", "37.8715,-122.2595"])
+
+        # A fresh geocoder is served entirely from the on-disk cache
+        cached_geocoder = ReverseGeocoder(self.provider, cache, requests_per_second=0)
+        self.assertEqual(cached_geocoder.locate(37.87151, -122.25946), location_infos[0])
+        self.assertEqual(len(StubGeocodeHandler.requests_seen), 2)
+
+        cache.close()
+
+    def test_fetch_status(self):
+        provider = GoogleGeocoder(api_key="test", base_url=self.provider.base_url, retries=2, backoff=0)
+        geocoder = ReverseGeocoder(provider, requests_per_second=0)
+
+        # Quota errors are retried, anything else that is not OK or ZERO_RESULTS fails straight away
+        StubGeocodeHandler.statuses = ["OVER_QUERY_LIMIT", "OVER_QUERY_LIMIT"]
+        self.assertEqual(geocoder.locate(34.05, -118.25)["country"], "United States")
+        self.assertEqual(len(StubGeocodeHandler.requests_seen), 3)
+
+        StubGeocodeHandler.statuses = ["OVER_QUERY_LIMIT"] * 3
+        with self.assertRaises(GeocodeError):
+            geocoder.locate(36.0, -119.0)
+
+        StubGeocodeHandler.statuses = ["REQUEST_DENIED"]
+        with self.assertRaises(GeocodeError):
+            geocoder.locate(38.0, -121.0)
+        self.assertEqual(len(StubGeocodeHandler.requests_seen), 7)
+
+    def test_failures_are_not_cached(self):
+        cache = LocationCache(os.path.join(self.temp_dir.name, "locations.sqlite"))
+        provider = GoogleGeocoder(api_key="test", base_url=self.provider.base_url, retries=0)
+
+        StubGeocodeHandler.statuses = ["OVER_QUERY_LIMIT"]
+        with self.assertRaises(GeocodeError):
+            ReverseGeocoder(provider, cache, requests_per_second=0).locate(34.05, -118.25)
+        self.assertIsNone(cache.get("34.0500_-118.2500"))
+
+        # A later run asks again instead of reusing an empty record
+        location = ReverseGeocoder(provider, cache, requests_per_second=0).locate(34.05, -118.25)
+        self.assertEqual(location["administrative_area_level_1"], "California")
+        self.assertEqual(cache.get("34.0500_-118.2500"), location)
+        self.assertEqual(len(StubGeocodeHandler.requests_seen), 2)
+
+        cache.close()
+
+
+class TestProjectLocation(unittest.TestCase):
+    def test_first_component_of_each_type_is_kept(self):
+        response = {"results": [
+            {"address_components": [{"long_name": "Alameda County", "types": ["administrative_area_level_2"]},
+                                    {"long_name": "California", "types": ["administrative_area_level_1", "political"]}]},
+            {"address_components": [{"long_name": "Nevada", "types": ["administrative_area_level_1"]},
+                                    {"long_name": "United States", "types": ["country", "political"]}]},
+        ]}
+
+        location = project_location(response)
+        self.assertEqual(location, {"country": "United States", "administrative_area_level_1": "California"})
+        self.assertEqual(extract_location_of_type(location, "country"), "United States")
+
+        empty = project_location({"results": []})
+        with self.assertRaises(ValueError):
+            extract_location_of_type(empty, "country")
+
+
+class TestLocatedSpecimens(unittest.TestCase):
+    def test_partial_line_is_dropped(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "raw_located_specimens.jsonl")
+            with open(path, "w", encoding="utf8") as out_file:
+                out_file.write(json.dumps({"guid": "MVZ:Mamm:1"}) + "\n" + '{"guid": "MVZ:Ma')
+
+            self.assertEqual([specimen["guid"] for specimen in read_located_specimens(path)], ["MVZ:Mamm:1"])
+
+            trim_partial_line(path)
+            with open(path, "a", encoding="utf8") as out_file:
+                out_file.write(json.dumps({"guid": "MVZ:Mamm:2"}) + "\n")
+
+            self.assertEqual([specimen["guid"] for specimen in read_located_specimens(path)], ["MVZ:Mamm:1", "MVZ:Mamm:2"])
+
+    def test_trim_reads_back_across_blocks(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "raw_located_specimens.jsonl")
+            complete = json.dumps({"guid": "MVZ:Mamm:1"}) + "\n"
+            with open(path, "w", encoding="utf8") as out_file:
+                out_file.write(complete + '{"guid": "MVZ:Mamm:2", "remarks": "' + "x" * 50)
+
+            trim_partial_line(path, block_size=8)
+            with open(path, "r", encoding="utf8") as in_file:
+                self.assertEqual(in_file.read(), complete)
+
+            # Complete files are left alone, a file without any newline is emptied
+            trim_partial_line(path, block_size=8)
+            self.assertEqual(os.path.getsize(path), len(complete))
+
+            with open(path, "w", encoding="utf8") as out_file:
+                out_file.write('{"guid": "MVZ:Ma')
+            trim_partial_line(path, block_size=8)
+            self.assertEqual(os.path.getsize(path), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import sqlite3
+import unittest
+
+from ranges.query_builder import batched_queries, guid_batches, in_condition, pivot_query, render_query
+
+class TestQueryBuilder(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:")
+        self.connection.execute("CREATE TABLE flat (collection_object_id INTEGER, guid TEXT, ended_date TEXT, collectors TEXT)")
+        self.connection.execute("CREATE TABLE attributes (collection_object_id INTEGER, attribute_type TEXT, attribute_value TEXT)")
+
+        self.connection.executemany("INSERT INTO flat VALUES (?, ?, ?, ?)", [
+            (1, "MVZ:Mamm:1", "2009-09-15", "James L. Patton"),
+            (2, "MVZ:Mamm:2", "1982-06-28", "Richard M. Warner"),
+            (3, "MVZ:Mamm:3", "1982-06-28", "Richard M. Warner"),
+        ])
+        self.connection.executemany("INSERT INTO attributes VALUES (?, ?, ?)", [
+            (1, "total length", "95"),
+            (1, "weight", "41"),
+            (1, "sex", "male"),
+            (3, "weight", "12"),
+        ])
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_pivot_query(self):
+        sql, params = pivot_query(["total length", "weight"], conditions=[in_condition("flat.guid", ["MVZ:Mamm:1", "MVZ:Mamm:2"])])
+
+        self.assertEqual(self.connection.execute(sql, params).fetchall(), [
+            (1, "MVZ:Mamm:1", "2009-09-15", "James L. Patton", "95", "41"),
+            (2, "MVZ:Mamm:2", "1982-06-28", "Richard M. Warner", None, None),
+        ])
+
+        # The rendered form runs the same without parameters
+        self.assertEqual(self.connection.execute(render_query(sql, params)).fetchall(),
+                         self.connection.execute(sql, params).fetchall())
+
+    def test_batched_queries(self):
+        self.assertEqual(guid_batches(["MVZ:Mamm:3", "MVZ:Mamm:1", "MVZ:Mamm:2", "MVZ:Mamm:1"], 2),
+                         [["MVZ:Mamm:1", "MVZ:Mamm:2"], ["MVZ:Mamm:3"]])
+
+        rows = []
+        for sql, params in batched_queries(["weight"], ["MVZ:Mamm:1", "MVZ:Mamm:2", "MVZ:Mamm:3"], batch_size=2):
+            rows.extend(self.connection.execute(sql, params).fetchall())
+
+        self.assertEqual([(row[1], row[4]) for row in rows], [("MVZ:Mamm:1", "41"), ("MVZ:Mamm:2", None), ("MVZ:Mamm:3", "12")])
+
+    def test_render_query(self):
+        self.assertEqual(render_query("SELECT \"a?\" FROM flat WHERE guid = ? AND cat_num = ? AND x IS ?", ["O'Neil", 5, None]),
+                         "SELECT \"a?\" FROM flat WHERE guid = 'O''Neil' AND cat_num = 5 AND x IS NULL")
+
+
+if __name__ == "__main__":
+    unittest.main()
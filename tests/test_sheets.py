@@ -97,6 +97,29 @@ class TestSheetParser(unittest.TestCase):
         with self.assertRaises(ValueError):
             number, unit, text = SheetParser.parse_numerical_attribute("123", None, None)
 
+    def test_compile_header(self):
+        columns = ["MVZ#", "collectors", "total", "tail", "hf", "Notch", "unit", "weight", "units", "repro comments", "testis L"]
+        plan = SheetParser.compile_header(columns)
+
+        self.assertIn("MVZ#", plan.source_names)
+        self.assertIn("collectors", plan.source_names)
+
+        record = plan.extract(("12345", " R. Warner ", "95", "41", "11", "6", None, "4", "g", "not recorded", "3"))
+        self.assertEqual(record["mvz_num"], "12345")
+        self.assertEqual(record["collector"], "R. Warner")
+        self.assertEqual(record["ear_from_notch"], "6")
+        self.assertEqual(record["testes_length"], "3")
+        self.assertIsNone(record["repro_comments"])
+        self.assertIsNone(record["ear_from_crown"])
+
+        self.assertEqual(record, SheetParser.extract_record(dict(zip(columns, ("12345", " R. Warner ", "95", "41", "11", "6", None, "4", "g", "not recorded", "3")))))
+
+        with self.assertRaises(ValueError):
+            SheetParser.compile_header(["MVZ #", "total", "tail", "hf", "unit", "wt", "units", "repro comments"])
+
+        with self.assertRaises(ValueError):
+            SheetParser.compile_header(["total", "tail", "hf", "ear", "unit", "wt", "units", "repro comments"])
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+import openpyxl
+
+from ranges.verify_sheet import is_valid_cell, scan_headers, verify_excel, verify_workbooks
+
+class TestVerifySheet(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.temp_dir.name, "accession.xlsx")
+
+        workbook = openpyxl.Workbook()
+        worksheet = workbook.active
+        worksheet.append(["MVZ#", "total", "tail", "hf", "ear", "unit", "wt", "units", "repro comments", "emb count"])
+        worksheet.append([12345, "95", "41 3/8", "11", "6", "mm", "4.5", "g", "scrotal", "3"])
+        worksheet.append(["MVZ:Mamm:12346", "192 mm", "not recorded", "13+", "7", "inches", "12 oz", "oz", None, "x"])
+        worksheet.append(["abc", "216", "65*", "14", "6", "ft", "9", "g", None, None])
+        workbook.save(self.file_name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_is_valid_cell(self):
+        self.assertTrue(is_valid_cell("total_length", "14 3/8"))
+        self.assertTrue(is_valid_cell("weight", "65 oz"))
+        self.assertFalse(is_valid_cell("total_length", "13+"))
+        self.assertFalse(is_valid_cell("mvz_num", "abc"))
+        self.assertFalse(is_valid_cell("distance_unit", "ft"))
+        self.assertTrue(is_valid_cell("repro_comments", "anything"))
+
+    def test_verify_excel(self):
+        report = verify_excel(self.file_name)
+        result = report.to_dict()
+
+        self.assertEqual(result["rows"], 3)
+        self.assertEqual(result["aliased_columns"], {"mvz_num": "MVZ#"})
+        self.assertEqual(result["columns"]["tail_length"], {"recorded": 2, "failed": 1, "examples": ["65*"]})
+        self.assertEqual(result["columns"]["hind_foot_with_claw"]["failed"], 1)
+        self.assertEqual(result["columns"]["mvz_num"]["failed"], 1)
+        self.assertEqual(result["columns"]["distance_unit"]["failed"], 1)
+        self.assertEqual(result["columns"]["embryo_count"], {"recorded": 2, "failed": 1, "examples": ["x"]})
+        self.assertEqual(report.failure_count(), 5)
+
+    def test_missing_mvz_num(self):
+        workbook = openpyxl.load_workbook(self.file_name)
+        workbook.active.append([None, "95", "41", "11", "6", "mm", "4", "g", None, None])
+        workbook.save(self.file_name)
+
+        report = verify_excel(self.file_name)
+
+        self.assertEqual(report.errors, ["Missing mvz_num in data row 4"])
+        self.assertEqual(report.failure_count(), 6)
+
+    def test_verify_workbooks(self):
+        workbook = openpyxl.load_workbook(self.file_name)
+        fall = workbook.create_sheet("Fall")
+        fall.append(["MVZ#", "total", "tail", "hf", "ear", "unit", "wt", "units", "repro comments"])
+        fall.append([12347, "1O5", "41", "11", "6", "mm", "4.5", "g", None])
+        workbook.create_sheet("Empty")
+        workbook.save(self.file_name)
+
+        reports = verify_workbooks([self.file_name])
+
+        self.assertEqual([(report.file_name, report.sheet_name) for report in reports],
+                         [(self.file_name, "Sheet"), (self.file_name, "Fall")])
+        self.assertEqual(reports[0].failure_count(), 5)
+        self.assertEqual(reports[1].to_dict()["columns"]["total_length"], {"recorded": 1, "failed": 1, "examples": ["1O5"]})
+
+        self.assertEqual([report.sheet_name for report in verify_workbooks([self.file_name], sheets=["Fall"])], ["Fall"])
+
+    def test_scan_headers(self):
+        workbook = openpyxl.load_workbook(self.file_name)
+        workbook.create_sheet("Notes").append(["MVZ #", "total", "remarks"])
+        workbook.save(self.file_name)
+
+        sheets = scan_headers(self.file_name)
+
+        self.assertEqual([sheet["sheet_name"] for sheet in sheets], ["Sheet", "Notes"])
+        self.assertEqual(sheets[0]["missing_columns"], [])
+        self.assertEqual(sheets[0]["aliased_columns"], {"mvz_num": "MVZ#"})
+        self.assertEqual(sheets[1]["missing_columns"], ["tail_length", "hind_foot_with_claw", "distance_unit", "weight",
+                                                        "weight_unit", "repro_comments"])
+        self.assertEqual(sheets[1]["unknown_columns"], ["remarks"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import datetime
+import math
+import os
+import tempfile
+import unittest
+
+import openpyxl
+import pandas as pd
+
+from ranges.workbooks import read_headers, read_records, read_sheet
+
+class TestWorkbookReader(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.temp_dir.name, "accession.xlsx")
+
+        workbook = openpyxl.Workbook()
+        worksheet = workbook.active
+        worksheet.append(["MVZ #", "total", None, "date"])
+        worksheet.append([12345, "95 mm", 4.5, datetime.datetime(2009, 9, 15)])
+        worksheet.append(["12346", 96.0, "NA", None])
+        worksheet.append([None, None, None, None])
+        worksheet.append(["12347", "not recorded", None, "1982-06-28"])
+        workbook.save(self.file_name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_read_sheet(self):
+        columns, rows = read_sheet(self.file_name)
+
+        self.assertEqual(columns, ["MVZ #", "total", "Unnamed: 2", "date"])
+        self.assertEqual(list(rows), [
+            ("12345", "95 mm", "4.5", "2009-09-15 00:00:00"),
+            ("12346", "96", None, None),
+            ("12347", "not recorded", None, "1982-06-28"),
+        ])
+
+    def test_read_headers(self):
+        workbook = openpyxl.load_workbook(self.file_name)
+        workbook.create_sheet("Empty")
+        workbook.create_sheet("Summer").append(["MVZ#", "tail", None])
+        workbook.save(self.file_name)
+
+        self.assertEqual(read_headers(self.file_name), {
+            "Sheet": ["MVZ #", "total", "Unnamed: 2", "date"],
+            "Empty": [],
+            "Summer": ["MVZ#", "tail"],
+        })
+
+    def test_matches_read_excel(self):
+        expected = pd.read_excel(self.file_name, dtype=str).to_dict(orient="records")
+        expected = [record for record in expected
+                    if not all(isinstance(value, float) and math.isnan(value) for value in record.values())]
+        expected = [{key: None if isinstance(value, float) else value for key, value in record.items()}
+                    for record in expected]
+
+        self.assertEqual(list(read_records(self.file_name)), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()